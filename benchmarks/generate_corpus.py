@@ -0,0 +1,240 @@
+# benchmarks/generate_corpus.py
+
+import os
+import json
+import random
+import argparse
+
+LAYERS = ("Entity", "Repository", "Service", "Controller")
+NOUNS = (
+    "Account", "Order", "Invoice", "Customer", "Product", "Shipment", "Payment", "Ledger",
+    "Ticket", "Policy", "Claim", "Vendor", "Contract", "Report", "Schedule", "Inventory"
+)
+FIELD_TYPES = ("String", "Long", "Integer", "Boolean", "java.math.BigDecimal", "java.time.LocalDate")
+
+POM = """<?xml version="1.0" encoding="UTF-8"?>
+<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <modelVersion>4.0.0</modelVersion>
+  <groupId>com.bench</groupId>
+  <artifactId>bench-legacy</artifactId>
+  <version>1.0.0</version>
+  <dependencies>
+    <dependency><groupId>org.springframework</groupId><artifactId>spring-context</artifactId><version>5.3.30</version></dependency>
+    <dependency><groupId>org.springframework</groupId><artifactId>spring-jdbc</artifactId><version>5.3.30</version></dependency>
+  </dependencies>
+</project>
+"""
+
+# Stand-in for ./gradlew in the migrated tree (GradleSetupAgent keeps an existing wrapper).
+# It reports javac-style errors for every call the generator broke that is still present,
+# so build-driven repair runs end to end without a JDK or Gradle.
+FAKE_GRADLEW = r"""#!/usr/bin/env python3
+import os, re, sys
+
+BROKEN = re.compile(r'\.(fetch\w+ById|load\w+)\(')
+root = os.path.dirname(os.path.abspath(__file__))
+errors = 0
+print("> Task :compileJava")
+for directory, _, names in os.walk(os.path.join(root, "src")):
+    for name in sorted(names):
+        if not name.endswith(".java"):
+            continue
+        path = os.path.join(directory, name)
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        for number, line in enumerate(lines, 1):
+            match = BROKEN.search(line)
+            if match:
+                errors += 1
+                print(f"{path}:{number}: error: cannot find symbol")
+                print(line)
+                print(" " * (match.start() + 1) + "^")
+                print(f"  symbol:   method {match.group(1)}(Long)")
+                print(f"  location: class {name[:-5]}")
+if errors:
+    print(f"{errors} errors")
+    print("> Task :compileJava FAILED")
+    print("BUILD FAILED")
+    sys.exit(1)
+print("BUILD SUCCESSFUL")
+"""
+
+
+def _fields(rng: random.Random, count: int) -> list:
+    names = rng.sample(["name", "code", "status", "amount", "createdOn", "owner", "region", "priority", "notes", "active"], count)
+    return [(rng.choice(FIELD_TYPES), name) for name in names]
+
+
+def _accessors(fields: list, indent: str = "    ") -> str:
+    lines = []
+    for field_type, name in fields:
+        cap = name[0].upper() + name[1:]
+        lines.append(f"{indent}public {field_type} get{cap}() {{\n{indent}    return {name};\n{indent}}}\n")
+        lines.append(f"{indent}public void set{cap}({field_type} {name}) {{\n{indent}    this.{name} = {name};\n{indent}}}\n")
+    return "\n".join(lines)
+
+
+def _legacy_file(package: str, noun: str, layer: str, fields: list, helper: bool) -> str:
+    field_decls = "\n".join(f"    private {t} {n};" for t, n in fields)
+    if layer == "Entity":
+        body = f"{field_decls}\n\n    private Long id;\n\n{_accessors(fields)}"
+        return f"package {package};\n\nimport java.io.Serializable;\n\npublic class {noun} implements Serializable {{\n{body}}}\n"
+    if layer == "Repository":
+        return (
+            f"package {package};\n\nimport java.util.*;\n\npublic class {noun}Dao {{\n"
+            f"    private final Map<Long, {noun}> rows = new HashMap<>();\n\n"
+            f"    public {noun} load{noun}(Long id) {{\n        return rows.get(id);\n    }}\n\n"
+            f"    public void store{noun}(Long id, {noun} value) {{\n        rows.put(id, value);\n    }}\n\n"
+            f"    public List<{noun}> loadAll() {{\n        return new ArrayList<>(rows.values());\n    }}\n}}\n"
+        )
+    if layer == "Service":
+        name = f"{noun}Helper" if helper else f"{noun}Manager"
+        return (
+            f"package {package};\n\npublic class {name} {{\n    private {noun}Dao dao = new {noun}Dao();\n\n"
+            f"    public {noun} get{noun}(Long id) {{\n        {noun} value = dao.load{noun}(id);\n"
+            f"        if (value == null) {{\n            throw new IllegalArgumentException(\"missing {noun} \" + id);\n        }}\n"
+            f"        return value;\n    }}\n\n"
+            f"    public void save{noun}(Long id, {noun} value) {{\n        dao.store{noun}(id, value);\n    }}\n}}\n"
+        )
+    return (
+        f"package {package};\n\nimport javax.servlet.http.*;\n\npublic class {noun}Servlet extends HttpServlet {{\n"
+        f"    private {noun}Manager manager = new {noun}Manager();\n\n"
+        f"    protected void doGet(HttpServletRequest request, HttpServletResponse response) {{\n"
+        f"        Long id = Long.valueOf(request.getParameter(\"id\"));\n"
+        f"        request.setAttribute(\"{noun.lower()}\", manager.get{noun}(id));\n    }}\n}}\n"
+    )
+
+
+def _migrated_file(package: str, noun: str, layer: str, fields: list, broken: bool) -> str:
+    field_decls = "\n".join(f"    private {t} {n};" for t, n in fields)
+    if layer == "Entity":
+        return (
+            f"package {package};\n\nimport jakarta.persistence.*;\n\n@Entity\npublic class {noun} {{\n"
+            f"    @Id\n    @GeneratedValue\n    private Long id;\n\n{field_decls}\n\n{_accessors(fields)}}}\n"
+        )
+    if layer == "Repository":
+        return (
+            f"package {package};\n\nimport java.util.Optional;\nimport org.springframework.data.jpa.repository.JpaRepository;\n\n"
+            f"public interface {noun}Repository extends JpaRepository<{noun}, Long> {{\n"
+            f"    Optional<{noun}> findBy{noun}Id(Long id);\n}}\n"
+        )
+    # Broken files call a repository/service method under a plausible but wrong name.
+    # Annotation array values ({...} inside @A(...)) are kept: they once broke parse_java's headers
+    if layer == "Service":
+        lookup = f"fetch{noun}ById" if broken else f"findBy{noun}Id"
+        return (
+            f"package {package};\n\nimport org.springframework.beans.factory.annotation.Autowired;\n"
+            f"import org.springframework.stereotype.Service;\n\n@Service\npublic class {noun}Service {{\n"
+            f"    @Autowired\n    private {noun}Repository {noun[0].lower() + noun[1:]}Repository;\n\n"
+            f"    @SuppressWarnings({{\"unchecked\", \"rawtypes\"}})\n"
+            f"    public {noun} get{noun}(Long id) {{\n"
+            f"        return {noun[0].lower() + noun[1:]}Repository.{lookup}(id).orElseThrow();\n    }}\n\n"
+            f"    public {noun} save{noun}({noun} value) {{\n"
+            f"        return {noun[0].lower() + noun[1:]}Repository.save(value);\n    }}\n}}\n"
+        )
+    call = f"load{noun}" if broken else f"get{noun}"
+    return (
+        f"package {package};\n\nimport org.springframework.beans.factory.annotation.Autowired;\n"
+        f"import org.springframework.web.bind.annotation.*;\n\n@RestController\n@RequestMapping({{\"/{noun.lower()}s\"}})\n"
+        f"public class {noun}Controller {{\n    @Autowired\n    private {noun}Service {noun[0].lower() + noun[1:]}Service;\n\n"
+        f"    @GetMapping(\"/{{id}}\")\n    public {noun} get(@PathVariable Long id) {{\n"
+        f"        return {noun[0].lower() + noun[1:]}Service.{call}(id);\n    }}\n}}\n"
+    )
+
+
+def _write(path: str, content: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def generate_corpus(root: str, files: int = 100, broken: float = 0.2, references: int = None, seed: int = 42,
+                    fake_build: bool = True) -> dict:
+    """
+    Writes a deterministic synthetic project under `root`:
+    legacy/ (plain Java + pom.xml), migrated/ (Spring Boot, `broken` fraction with wrong
+    method names), reference/, enterprise/ and mapping.json in MappingLoader's format.
+    With `fake_build` the migrated tree gets a scripted gradlew (see FAKE_GRADLEW).
+    Returns the paths and counts.
+    """
+    rng = random.Random(seed)
+    paths = {name: os.path.join(root, name) for name in ("legacy", "migrated", "reference", "enterprise")}
+    _write(os.path.join(paths["legacy"], "pom.xml"), POM)
+    if fake_build and os.name != "nt":
+        gradlew = os.path.join(paths["migrated"], "gradlew")
+        _write(gradlew, FAKE_GRADLEW)
+        os.chmod(gradlew, 0o755)
+
+    mapping = []
+    count = 0
+    domain = 0
+    while count < files:
+        noun = f"{NOUNS[domain % len(NOUNS)]}{domain // len(NOUNS) or ''}"
+        legacy_package = f"com.bench.legacy.d{domain}"
+        migrated_package = f"com.bench.app.d{domain}"
+        fields = _fields(rng, rng.randint(2, 6))
+        for layer in LAYERS:
+            if count >= files:
+                break
+            legacy_name = {"Entity": noun, "Repository": f"{noun}Dao", "Service": f"{noun}Manager", "Controller": f"{noun}Servlet"}[layer]
+            migrated_name = noun if layer == "Entity" else f"{noun}{layer}"
+            legacy_rel = os.path.join("src", "main", "java", *legacy_package.split("."), f"{legacy_name}.java")
+            migrated_rel = os.path.join("src", "main", "java", *migrated_package.split("."), f"{migrated_name}.java")
+            is_broken = layer in ("Service", "Controller") and rng.random() < broken * 2
+
+            _write(os.path.join(paths["legacy"], legacy_rel), _legacy_file(legacy_package, noun, layer, fields, helper=False))
+            _write(os.path.join(paths["migrated"], migrated_rel), _migrated_file(migrated_package, noun, layer, fields, is_broken))
+            sources = [legacy_rel]
+            # Some services were merged from a manager and a helper
+            if layer == "Service" and rng.random() < 0.3:
+                helper_rel = os.path.join("src", "main", "java", *legacy_package.split("."), f"{noun}Helper.java")
+                _write(os.path.join(paths["legacy"], helper_rel), _legacy_file(legacy_package, noun, layer, fields, helper=True))
+                sources.append(helper_rel)
+            mapping.append({
+                "source": sources,
+                "target": [migrated_rel],
+                "source_component_type": layer,
+                "target_component_type": layer
+            })
+            count += 1
+        domain += 1
+
+    references = references if references is not None else max(20, files // 4)
+    for i in range(references):
+        noun = f"Ref{NOUNS[i % len(NOUNS)]}{i}"
+        layer = LAYERS[i % len(LAYERS)]
+        name = noun if layer == "Entity" else f"{noun}{layer}"
+        _write(
+            os.path.join(paths["reference"], "src", "main", "java", "com", "ref", f"{name}.java"),
+            _migrated_file("com.ref", noun, layer, _fields(rng, rng.randint(2, 6)), broken=False)
+        )
+
+    for name in ("AuditSupport", "TenantContext", "ErrorCodes", "BaseEntity", "PagingRequest"):
+        _write(
+            os.path.join(paths["enterprise"], "src", "main", "java", "com", "corp", "framework", f"{name}.java"),
+            f"package com.corp.framework;\n\npublic class {name} {{\n    public static final String NAME = \"{name}\";\n}}\n"
+        )
+
+    mapping_path = os.path.join(root, "mapping.json")
+    with open(mapping_path, "w", encoding="utf-8") as f:
+        json.dump(mapping, f, indent=2)
+
+    return {**paths, "mapping": mapping_path, "files": count, "references": references}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic migration corpus")
+    parser.add_argument("--out", required=True, help="Directory to write the corpus into")
+    parser.add_argument("--files", type=int, default=100, help="Number of migrated target files")
+    parser.add_argument("--broken", type=float, default=0.2, help="Fraction of targets with compile errors")
+    parser.add_argument("--references", type=int, default=None, help="Reference files (default files/4, at least 20)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--real-build", action="store_true", help="Do not write the scripted gradlew; use a real Gradle")
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.out, args.files, args.broken, args.references, args.seed, fake_build=not args.real_build)
+    print(f"🧪 Generated {corpus['files']} targets and {corpus['references']} reference files in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# benchmarks/run_benchmark.py
+#
+# End-to-end throughput benchmark. Each scale runs in a fresh Python process against a
+# freshly generated corpus, with LLM_PROVIDER=fake so results do not depend on an API.
+#
+#   python benchmarks/run_benchmark.py --scales 100 1000 --latency-ms 200
+#   python benchmarks/run_benchmark.py --scales 100 --save-baseline
+#
+# The build is a scripted gradlew that reports the generator's broken calls as javac
+# errors (see generate_corpus.FAKE_GRADLEW); pass --real-build to use a real Gradle.
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+TOOL_DIR = os.path.join(REPO_ROOT, "migration_assist_tool")
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Per-stage span names reported next to the headline numbers
+STAGES = (
+    "gradle.setup", "repair", "retry.target", "repair.file", "agent.fix", "agent.complete",
+    "context.build", "llm.request", "llm.chat", "llm.embed", "embed.index", "embed.search",
+    "compile.check", "compile.javac", "gradle.build", "disk.write"
+)
+
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def check_parser(migrated: str):
+    """
+    Regression check of parse_java on the generated tree: every class keeps its annotations
+    and header, and public methods stay public (annotation array values once broke both).
+    """
+    from agents.java_parser import parse_java
+    for directory, _, names in os.walk(migrated):
+        for name in names:
+            if not name.endswith(".java"):
+                continue
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                code = f.read()
+            parsed = parse_java(code)
+            for declared in parsed["types"]:
+                header = code[declared["decl_start"]:declared["body_start"]]
+                if not re.match(r'\s*[@\w]', header):
+                    raise AssertionError(f"{name}: class header lost its annotations: {header!r}")
+            for method in parsed["methods"]:
+                if f"public {method['return_type']} {method['name']}(" in code and "public" not in method["modifiers"]:
+                    raise AssertionError(f"{name}: {method['name']} parsed as {method['modifiers']} {method['return_type']!r}")
+
+
+def run_one(scale: int, workdir: str, latency_ms: float, broken: float, seed: int, real_build: bool = False) -> dict:
+    """
+    Generates a corpus and runs the pipeline in this process. Call in a fresh process:
+    the fake provider, caches and peak RSS are all process-wide.
+    """
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(latency_ms)
+    os.environ.setdefault("LLM_CACHE_MODE", "bypass")
+    sys.path[:0] = [REPO_ROOT, TOOL_DIR]
+
+    from benchmarks.generate_corpus import generate_corpus
+    corpus = generate_corpus(workdir, files=scale, broken=broken, seed=seed, fake_build=not real_build)
+    check_parser(corpus["migrated"])
+    # Caches, logs and build scratch space are relative paths; keep them inside the workdir
+    os.chdir(workdir)
+
+    from cli import run_pipeline
+    from utils.tracing import get_tracer
+
+    start = time.perf_counter()
+    result = run_pipeline(
+        legacy=corpus["legacy"],
+        migrated=corpus["migrated"],
+        map_path=corpus["mapping"],
+        reference=corpus["reference"],
+        enterprise=corpus["enterprise"],
+        fresh=True
+    )
+    elapsed = time.perf_counter() - start
+
+    stages = {s["name"]: s for s in get_tracer().summary(top=len(STAGES) * 4)["stages"]}
+    return {
+        "scale": scale,
+        "files": corpus["files"],
+        "latency_ms": latency_ms,
+        "build": "gradle" if real_build else "scripted",
+        "elapsed": elapsed,
+        "files_per_min": corpus["files"] / elapsed * 60 if elapsed else 0.0,
+        "peak_rss_mb": _peak_rss_mb(),
+        "status": result["status"],
+        "retry_attempts": result.get("retry_attempts", 0),
+        "stages": {name: {"total": stages[name]["total"], "count": stages[name]["count"]} for name in STAGES if name in stages}
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Regressions of `result` against `baseline`: throughput down or peak RSS up by more than `tolerance`.
+    """
+    regressions = []
+    if baseline.get("files_per_min") and result["files_per_min"] < baseline["files_per_min"] * (1 - tolerance):
+        regressions.append(f"files/min {result['files_per_min']:.1f} vs baseline {baseline['files_per_min']:.1f}")
+    if baseline.get("peak_rss_mb") and result["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        regressions.append(f"peak RSS {result['peak_rss_mb']:.0f} MB vs baseline {baseline['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def _print_result(result: dict, baseline: dict):
+    print(f"\n📊 scale={result['scale']} files={result['files']} latency={result['latency_ms']}ms status={result['status']}")
+    print(f"   {result['files_per_min']:10.1f} files/min   {result['elapsed']:8.1f}s   peak RSS {result['peak_rss_mb']:.0f} MB")
+    for name, stage in sorted(result["stages"].items(), key=lambda item: -item[1]["total"]):
+        before = (baseline or {}).get("stages", {}).get(name)
+        delta = f"  (baseline {before['total']:.2f}s)" if before else ""
+        print(f"   {name:<16} {stage['total']:9.2f}s  {stage['count']:7d} calls{delta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the end-to-end pipeline benchmark on synthetic corpora")
+    parser.add_argument("--scales", type=int, nargs="+", default=[100], help="Target file counts, e.g. 100 1000 10000")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Simulated latency per fake LLM/embedding call")
+    parser.add_argument("--broken", type=float, default=0.2, help="Fraction of targets generated with compile errors")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed regression versus the baseline (fraction)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baselines")
+    parser.add_argument("--real-build", action="store_true", help="Build with a real Gradle instead of the scripted gradlew")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated corpora and run directories")
+    parser.add_argument("--run-one", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one is not None:
+        result = run_one(args.run_one, args.workdir, args.latency_ms, args.broken, args.seed, args.real_build)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        return
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    failed = False
+    for scale in args.scales:
+        workdir = tempfile.mkdtemp(prefix=f"bench-{scale}-")
+        output = os.path.join(workdir, "result.json")
+        print(f"🏁 Benchmark scale {scale} in {workdir}")
+        run = subprocess.run([
+            sys.executable, os.path.abspath(__file__), "--run-one", str(scale), "--workdir", workdir,
+            "--output", output, "--latency-ms", str(args.latency_ms), "--broken", str(args.broken), "--seed", str(args.seed)
+        ] + (["--real-build"] if args.real_build else []), cwd=REPO_ROOT)
+        if run.returncode != 0 or not os.path.exists(output):
+            print(f"🚨 Scale {scale} crashed (exit {run.returncode})")
+            failed = True
+            continue
+        with open(output, "r", encoding="utf-8") as f:
+            result = json.load(f)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        baseline_path = os.path.join(BASELINE_DIR, f"scale-{scale}.json")
+        baseline = None
+        if os.path.exists(baseline_path):
+            with open(baseline_path, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        _print_result(result, baseline)
+
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        with open(os.path.join(RESULTS_DIR, f"{stamp}-scale-{scale}.json"), "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+        if args.save_baseline:
+            os.makedirs(BASELINE_DIR, exist_ok=True)
+            with open(baseline_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+            print(f"💾 Baseline saved to {baseline_path}")
+        elif baseline:
+            if baseline.get("latency_ms") != result["latency_ms"]:
+                print(f"⚠️ Baseline was recorded at {baseline.get('latency_ms')}ms latency; comparison is indicative only")
+            regressions = compare(result, baseline, args.tolerance)
+            for regression in regressions:
+                print(f"🚨 Regression: {regression}")
+            failed = failed or bool(regressions)
+        else:
+            print(f"ℹ️ No baseline for scale {scale}; run with --save-baseline to record one")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,48 +5,108 @@ import os
 from agents.gradle_setup_agent import GradleSetupAgent
 from agents.retry_agent import RetryAgent
 from agents.mapping_loader import MappingLoader
+from agents.run_journal import open_run, read_run_inputs
+from utils.tracing import get_tracer, span
 
-def main():
-    parser = argparse.ArgumentParser(description="Run migration refinement tool")
-    parser.add_argument("--legacy", required=True, help="Path to legacy codebase")
-    parser.add_argument("--migrated", required=True, help="Path to migrated codebase")
-    parser.add_argument("--map", required=True, help="Path to mapping.json file")
-    parser.add_argument("--reference", help="Path to reference applications (legacy + migrated)", default="")
-    parser.add_argument("--enterprise", help="Path to shared enterprise framework", default="")
-
-    args = parser.parse_args()
+def run_pipeline(legacy: str, migrated: str, map_path: str, reference: str = "", enterprise: str = "", trace: str = "",
+                 resume: str = "", fresh: bool = False) -> dict:
+    """
+    Runs the whole refinement pipeline (Gradle setup, then build-driven repair) and
+    returns the repair result. Used by main() and by the benchmark harness.
 
+    Progress is journaled under logs/runs/. An unfinished run over the same inputs is
+    resumed automatically (or the one named by `resume`) unless `fresh` is set.
+    """
     print("🚀 Starting Migration Assist Refinement Pipeline")
-    print(f"📁 Legacy dir:     {args.legacy}")
-    print(f"📁 Migrated dir:   {args.migrated}")
-    print(f"📄 Mapping file:   {args.map}")
-    print(f"📂 Reference dir:  {args.reference or 'None'}")
-    print(f"📂 Enterprise dir: {args.enterprise or 'None'}")
+    print(f"📁 Legacy dir:     {legacy}")
+    print(f"📁 Migrated dir:   {migrated}")
+    print(f"📄 Mapping file:   {map_path}")
+    print(f"📂 Reference dir:  {reference or 'None'}")
+    print(f"📂 Enterprise dir: {enterprise or 'None'}")
     print("─────────────────────────────────────────────")
 
+    journal = open_run(legacy, migrated, map_path, reference, enterprise, run_id=resume, fresh=fresh)
+
     # Load mapping.json
-    mapping = MappingLoader(args.map)
+    mapping = MappingLoader(map_path)
 
     # Step 1: Setup Gradle files
-    gradle_setup = GradleSetupAgent(
-        migrated_dir=args.migrated,
-        legacy_dir=args.legacy,
-        reference_dir=args.reference
-    )
-    gradle_setup.setup()
+    if journal.stage_done("gradle_setup") and os.path.exists(os.path.join(migrated, "build.gradle")):
+        print("⏭️ Gradle setup already done in this run")
+    else:
+        gradle_setup = GradleSetupAgent(
+            migrated_dir=migrated,
+            legacy_dir=legacy,
+            reference_dir=reference
+        )
+        with span("gradle.setup"):
+            gradle_setup.setup()
+        journal.mark_stage("gradle_setup")
 
-    # Step 2: Retry fixes and complete migration
+    # Step 2: Build, then fix only the files the build flags, until it is clean
     retry_agent = RetryAgent(
-        legacy_dir=args.legacy,
-        migrated_dir=args.migrated,
-        enterprise_dir=args.enterprise,
-        reference_dir=args.reference
+        legacy_dir=legacy,
+        migrated_dir=migrated,
+        enterprise_dir=enterprise,
+        reference_dir=reference,
+        journal=journal
     )
-    result = retry_agent.retry_fixes(mapping=mapping)
+    try:
+        with span("repair"):
+            result = retry_agent.repair_from_build(mapping=mapping)
+    except KeyboardInterrupt:
+        journal.close()
+        print(f"\n⏸️ Interrupted. Resume with: --resume {journal.run_id}")
+        raise
+    journal.finish(result["status"])
 
     print("✅ Migration Assist post-processing complete.")
     print(f"🔧 Final Status: {result['status']}")
     print(f"🔁 Retry Attempts: {result.get('retry_attempts', 0)}")
+    print(f"📓 Run {journal.run_id}: {journal.summary()}")
+
+    tracer = get_tracer()
+    tracer.print_summary()
+    if trace:
+        tracer.export(trace)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Run migration refinement tool")
+    parser.add_argument("--legacy", help="Path to legacy codebase")
+    parser.add_argument("--migrated", help="Path to migrated codebase")
+    parser.add_argument("--map", help="Path to mapping.json file")
+    parser.add_argument("--reference", help="Path to reference applications (legacy + migrated)", default="")
+    parser.add_argument("--enterprise", help="Path to shared enterprise framework", default="")
+    parser.add_argument("--trace", help="Write a Chrome trace of the run to this file (open in chrome://tracing or Perfetto)", default="")
+
+    parser.add_argument("--resume", help="Resume the run with this id (paths default to the run's own)", default="")
+    parser.add_argument("--fresh", action="store_true", help="Start a new run even if an unfinished one matches these inputs")
+
+    args = parser.parse_args()
+    if args.resume:
+        try:
+            inputs = read_run_inputs(args.resume)
+        except FileNotFoundError as e:
+            parser.error(str(e))
+        args.legacy = args.legacy or inputs["legacy"]
+        args.migrated = args.migrated or inputs["migrated"]
+        args.map = args.map or inputs["map"]
+        args.reference = args.reference or inputs["reference"]
+        args.enterprise = args.enterprise or inputs["enterprise"]
+    elif not (args.legacy and args.migrated and args.map):
+        parser.error("--legacy, --migrated and --map are required unless --resume is given")
+
+    run_pipeline(
+        legacy=args.legacy,
+        migrated=args.migrated,
+        map_path=args.map,
+        reference=args.reference,
+        enterprise=args.enterprise,
+        trace=args.trace,
+        resume=args.resume,
+        fresh=args.fresh
+    )
 
 if __name__ == "__main__":
     main()
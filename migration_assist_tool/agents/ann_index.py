@@ -0,0 +1,123 @@
+# agents/ann_index.py
+
+import os
+from typing import Optional, Tuple
+import numpy as np
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index over L2-normalized float32 rows.
+
+    Rows are partitioned by a spherical k-means coarse quantizer into `nlist` lists.
+    A query scores the centroids, then only the rows in its `nprobe` closest lists,
+    so search cost grows with roughly sqrt(N) rather than N.
+    """
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 8, train_iters: int = 10, sample_per_list: int = 64, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iters = train_iters
+        self.sample_per_list = sample_per_list
+        self.seed = seed
+
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.order = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.generation = ""
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids.shape[0] > 0
+
+    def _assign(self, matrix: np.ndarray, block: int = 65536) -> np.ndarray:
+        assignments = np.empty(matrix.shape[0], dtype=np.int64)
+        for start in range(0, matrix.shape[0], block):
+            scores = np.asarray(matrix[start:start + block], dtype=np.float32) @ self.centroids.T
+            assignments[start:start + block] = np.argmax(scores, axis=1)
+        return assignments
+
+    def build(self, matrix: np.ndarray, generation: str = ""):
+        rows = matrix.shape[0]
+        nlist = self.nlist or max(1, int(np.sqrt(rows)))
+        nlist = min(nlist, rows)
+        rng = np.random.default_rng(self.seed)
+
+        sample_size = min(rows, nlist * self.sample_per_list)
+        sample_idx = np.sort(rng.choice(rows, size=sample_size, replace=False))
+        sample = np.asarray(matrix[sample_idx], dtype=np.float32)
+
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+        for _ in range(self.train_iters):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty lists from random sample rows
+                sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        self.centroids = centroids
+        assignments = self._assign(matrix)
+        self.order = np.argsort(assignments, kind="stable")
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))]).astype(np.int64)
+        self.generation = generation
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        centroid_scores = self.centroids @ query
+        nprobe = min(nprobe, len(centroid_scores))
+        if nprobe < len(centroid_scores):
+            probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probes = np.arange(len(centroid_scores))
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probes])
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (row indices, scores) of up to k approximate best matches, best first.
+        `mask` is an optional boolean row filter; probing widens until k eligible rows are found.
+        """
+        nprobe = self.nprobe
+        while True:
+            candidates = self._candidates(query, nprobe)
+            if mask is not None:
+                candidates = candidates[mask[candidates]]
+            if len(candidates) >= k or nprobe >= self.centroids.shape[0]:
+                break
+            nprobe *= 2
+
+        if len(candidates) == 0:
+            return candidates, np.zeros(0, dtype=np.float32)
+        # Gather in row order so the memory map is read sequentially
+        candidates = np.sort(candidates)
+        scores = np.asarray(matrix[candidates], dtype=np.float32) @ query
+        if k < len(candidates):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-scores[top])]
+        return candidates[top], scores[top]
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, centroids=self.centroids, order=self.order, offsets=self.offsets, generation=np.array(self.generation))
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> bool:
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path) as data:
+                self.centroids = data["centroids"]
+                self.order = data["order"]
+                self.offsets = data["offsets"]
+                self.generation = str(data["generation"])
+            return True
+        except Exception as e:
+            print(f"⚠️ Could not load ANN index {path}: {e}")
+            return False
@@ -0,0 +1,144 @@
+# agents/build_diagnostics.py
+
+import re
+from typing import Callable, List, Optional
+
+JAVAC_HEADER = re.compile(r'^(?:\[\w+\]\s*)?(.*?\.java):(\d+)(?::(\d+))?: (error|warning): (.*)$')
+DETAIL = re.compile(r'^\s+(symbol|location|required|found|reason|where)\b:?\s*(.*)$')
+SYMBOL = re.compile(r'^(class|interface|enum|method|variable|constructor|package|static)\s+(.+)$')
+MISSING_PACKAGE = re.compile(r'^package\s+([\w.]+)\s+does not exist')
+TASK_HEADER = re.compile(r'^> Task (:\S+)')
+WHAT_WENT_WRONG = "* What went wrong:"
+
+
+def make_diagnostic(kind: str, file: str, line: int, column: int, message: str, task: str = "") -> dict:
+    """
+    Builds a diagnostic record. `symbol:` / `location:` lines folded into a javac message
+    are split out into their own fields.
+    """
+    record = {
+        "kind": kind.upper(),
+        "file": file,
+        "line": line,
+        "column": column,
+        "symbol": "",
+        "symbol_kind": "",
+        "location": "",
+        "message": "",
+        "task": task
+    }
+    lines = message.splitlines() or [""]
+    record["message"] = lines[0].strip()
+    for extra in lines[1:]:
+        _add_detail(record, extra)
+    package = MISSING_PACKAGE.match(record["message"])
+    if package and not record["symbol"]:
+        record["symbol"], record["symbol_kind"] = package.group(1), "package"
+    return record
+
+
+def _add_detail(record: dict, line: str) -> bool:
+    detail = DETAIL.match(line)
+    if not detail:
+        return False
+    if detail.group(1) == "location":
+        record["location"] = detail.group(2).strip()
+    elif detail.group(1) == "symbol":
+        symbol = SYMBOL.match(detail.group(2).strip())
+        if symbol:
+            record["symbol_kind"], record["symbol"] = symbol.group(1), symbol.group(2)
+        else:
+            record["symbol"] = detail.group(2).strip()
+    return True
+
+
+class BuildDiagnosticParser:
+    """
+    Incremental parser for Gradle / javac console output.
+
+    Feed it lines as the build prints them; each diagnostic is emitted (returned from feed
+    and passed to `on_diagnostic`) as soon as its last continuation line has been seen, so
+    callers can act on the first errors while the build is still running.
+
+    Understands javac diagnostics (header, source line, caret column, `symbol:` and
+    `location:` details), the `> Task :x` currently running, and Gradle's
+    `* What went wrong:` failure summary, which becomes a record without a file.
+    """
+
+    def __init__(self, on_diagnostic: Optional[Callable[[dict], None]] = None):
+        self.on_diagnostic = on_diagnostic
+        self.diagnostics: List[dict] = []
+        self._pending: Optional[dict] = None
+        self._source_seen = False
+        self._task = ""
+        self._failure: Optional[List[str]] = None
+
+    def _emit(self, record: dict) -> dict:
+        self.diagnostics.append(record)
+        if self.on_diagnostic:
+            self.on_diagnostic(record)
+        return record
+
+    def _flush(self, emitted: List[dict]):
+        if self._pending is not None:
+            emitted.append(self._emit(self._pending))
+            self._pending = None
+        if self._failure:
+            emitted.append(self._emit(make_diagnostic("ERROR", "", 0, 0, " ".join(self._failure), self._task)))
+        self._failure = None
+
+    def feed(self, line: str) -> List[dict]:
+        line = line.rstrip("\r\n")
+        emitted: List[dict] = []
+
+        if self._failure is not None:
+            if line.strip():
+                self._failure.append(line.strip())
+            else:
+                self._flush(emitted)
+            return emitted
+
+        header = JAVAC_HEADER.match(line)
+        if header:
+            self._flush(emitted)
+            self._pending = make_diagnostic(
+                header.group(4), header.group(1).strip(), int(header.group(2)),
+                int(header.group(3) or 0), header.group(5), self._task
+            )
+            self._source_seen = False
+            return emitted
+
+        if self._pending is not None:
+            if _add_detail(self._pending, line):
+                return emitted
+            if line.strip() and set(line.strip()) <= {"^", "~"}:
+                self._pending["column"] = self._pending["column"] or line.index("^") + 1
+                return emitted
+            if not self._source_seen and line.strip() and not TASK_HEADER.match(line):
+                # The echoed source line sits between the header and the caret
+                self._source_seen = True
+                return emitted
+            self._flush(emitted)
+
+        task = TASK_HEADER.match(line)
+        if task:
+            self._task = task.group(1)
+        elif line.strip() == WHAT_WENT_WRONG:
+            self._failure = []
+        return emitted
+
+    def close(self) -> List[dict]:
+        emitted: List[dict] = []
+        self._flush(emitted)
+        return emitted
+
+
+def parse_build_output(output: str) -> List[dict]:
+    """
+    Parses finished build output in one go.
+    """
+    parser = BuildDiagnosticParser()
+    for line in output.splitlines():
+        parser.feed(line)
+    parser.close()
+    return parser.diagnostics
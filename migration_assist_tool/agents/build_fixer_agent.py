@@ -1,25 +1,32 @@
 # agents/build_fixer_agent.py
 
 import os
-import re
+from typing import List, Optional
+from agents.build_diagnostics import parse_build_output
+from utils.file_cache import read_text, write_text
 
 class BuildFixerAgent:
     def __init__(self, migrated_dir: str):
         self.migrated_dir = migrated_dir
         self.build_gradle = os.path.join(migrated_dir, "build.gradle")
 
-    def fix(self, build_output: str) -> dict:
+    def fix(self, build_output: str = "", diagnostics: Optional[List[dict]] = None) -> dict:
+        """
+        Patches build.gradle for the classes and packages the build could not find.
+        Takes the diagnostic records from BuildValidatorAgent, or raw build output to parse.
+        """
         if not os.path.exists(self.build_gradle):
             return {"status": "skipped", "reason": "No build.gradle"}
 
-        missing_classes = self._extract_missing_classes(build_output)
+        if diagnostics is None:
+            diagnostics = parse_build_output(build_output)
+        missing_classes = self._extract_missing_classes(diagnostics)
 
         if not missing_classes:
             return {"status": "skipped", "reason": "No dependency-related issues found"}
 
         fixes_applied = []
-        with open(self.build_gradle, "r", encoding="utf-8") as f:
-            gradle_code = f.read()
+        gradle_code = read_text(self.build_gradle)
 
         for class_name in missing_classes:
             suggestion = self._suggest_dependency(class_name)
@@ -28,8 +35,7 @@ class BuildFixerAgent:
                 fixes_applied.append(suggestion)
 
         if fixes_applied:
-            with open(self.build_gradle, "w", encoding="utf-8") as f:
-                f.write(gradle_code)
+            write_text(self.build_gradle, gradle_code)
 
             return {
                 "status": "fixed",
@@ -43,19 +49,16 @@ class BuildFixerAgent:
             "file": "build.gradle"
         }
 
-    def _extract_missing_classes(self, build_output: str):
-        # Look for: cannot find symbol, package xyz does not exist
+    def _extract_missing_classes(self, diagnostics: List[dict]):
+        # cannot find symbol (symbol: class Xyz) and package xyz does not exist
         missing = set()
-
-        # Pattern 1: symbol:   class Xyz
-        for match in re.finditer(r"symbol:\s+class\s+(\w+)", build_output):
-            missing.add(match.group(1))
-
-        # Pattern 2: package xyz does not exist
-        for match in re.finditer(r"package\s+([a-zA-Z0-9_.]+)\s+does not exist", build_output):
-            parts = match.group(1).split(".")
-            if parts:
-                missing.add(parts[-1])
+        for diagnostic in diagnostics:
+            if diagnostic["kind"] != "ERROR" or not diagnostic["symbol"]:
+                continue
+            if diagnostic["symbol_kind"] == "class":
+                missing.add(diagnostic["symbol"])
+            elif diagnostic["symbol_kind"] == "package":
+                missing.add(diagnostic["symbol"].split(".")[-1])
 
         return list(missing)
 
@@ -1,54 +1,202 @@
 # agents/build_validator.py
 
 import subprocess
+import threading
+import signal
+import shutil
+import time
 import os
 import re
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
+from agents.build_diagnostics import BuildDiagnosticParser
+from utils.tracing import span
+
+FULL_TASKS = ["build"]
+FAST_TASKS = ["compileJava"]
+OFFLINE_MISS = re.compile(r"No cached version of .* available for offline mode", re.IGNORECASE)
+CONFIGURATION_CACHE_PROBLEM = re.compile(r"Configuration cache problems found|configuration cache .*not supported", re.IGNORECASE)
+# Marks the stand-in wrapper GradleSetupAgent writes when the project has none; it cannot build anything
+WRAPPER_PLACEHOLDER = "Gradle wrapper placeholder"
+
 
 class BuildValidatorAgent:
-    def __init__(self, migrated_dir: str):
+    """
+    Runs Gradle over the migrated project and reports whether it builds.
+
+    - mode="full" runs `build --stacktrace` (tests, packaging, the lot).
+    - mode="fast" runs only `tasks` (default compileJava) on the warm daemon with the build
+      cache, --offline and the configuration cache when the Gradle version supports it.
+      An offline or configuration-cache failure is retried once without that flag.
+    Every run is bounded by `timeout` seconds.
+    """
+
+    def __init__(self, migrated_dir: str, mode: Optional[str] = None, tasks: Optional[List[str]] = None,
+                 timeout: Optional[float] = None, offline: Optional[bool] = None):
         self.migrated_dir = migrated_dir
-        self.gradle_cmd = "./gradlew" if os.name != "nt" else "gradlew.bat"
+        self.mode = (mode or os.getenv("BUILD_VALIDATION_MODE", "fast")).lower()
+        env_tasks = os.getenv("BUILD_VALIDATION_TASKS", "").split()
+        self.tasks = tasks or env_tasks or (FAST_TASKS if self.mode == "fast" else FULL_TASKS)
+        self.timeout = timeout or float(os.getenv("BUILD_TIMEOUT", "900"))
+        self.offline = offline if offline is not None else os.getenv("GRADLE_OFFLINE", "auto").lower() != "off"
+        self.gradle_cmd = self._gradle_command()
+        self._configuration_cache = None
+
+    def _gradle_command(self) -> Optional[str]:
+        # Prefer the project's wrapper (unless it is our placeholder); fall back to a Gradle on PATH
+        wrapper = os.path.join(self.migrated_dir, "gradlew.bat" if os.name == "nt" else "gradlew")
+        if os.path.exists(wrapper) and not self._is_placeholder(wrapper):
+            return os.path.abspath(wrapper)
+        return shutil.which("gradle")
+
+    @staticmethod
+    def _is_placeholder(wrapper: str) -> bool:
+        try:
+            with open(wrapper, "r", encoding="utf-8", errors="replace") as f:
+                return WRAPPER_PLACEHOLDER in f.read(4096)
+        except OSError:
+            return False
+
+    def _gradle_version(self) -> Optional[tuple]:
+        properties = os.path.join(self.migrated_dir, "gradle", "wrapper", "gradle-wrapper.properties")
+        text = ""
+        if os.path.exists(properties):
+            with open(properties, "r", encoding="utf-8") as f:
+                text = f.read()
+        elif self.gradle_cmd:
+            try:
+                text = subprocess.run([self.gradle_cmd, "--version"], capture_output=True, text=True, timeout=120).stdout
+            except (OSError, subprocess.TimeoutExpired):
+                return None
+        match = re.search(r"gradle-(\d+)\.(\d+)|Gradle (\d+)\.(\d+)", text)
+        if not match:
+            return None
+        major, minor = [int(g) for g in match.groups() if g is not None]
+        return major, minor
+
+    def _supports_configuration_cache(self) -> bool:
+        if self._configuration_cache is None:
+            version = self._gradle_version()
+            # Stable from Gradle 8.1; earlier versions reject or only half-support the flag
+            self._configuration_cache = bool(version and version >= (8, 1))
+        return self._configuration_cache
 
-    def _run_gradle_build(self) -> subprocess.CompletedProcess:
-        return subprocess.run(
-            [self.gradle_cmd, "build", "--stacktrace"],
+    def _command(self, offline: bool, configuration_cache: bool) -> List[str]:
+        if self.mode != "fast":
+            return [self.gradle_cmd] + self.tasks + ["--stacktrace"]
+        command = [self.gradle_cmd] + self.tasks + ["--daemon", "--build-cache", "--console=plain"]
+        if offline:
+            command.append("--offline")
+        if configuration_cache:
+            command.append("--configuration-cache")
+        return command
+
+    def _run_gradle_build(self, command: List[str], on_diagnostic: Optional[Callable[[dict], None]] = None) -> dict:
+        """
+        Runs Gradle and parses its output line by line while it runs.
+        Returns {"returncode", "output", "diagnostics"}; returncode is -1 on timeout.
+        """
+        parser = BuildDiagnosticParser(on_diagnostic)
+        output = []
+        process = subprocess.Popen(
+            command,
             cwd=self.migrated_dir,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             text=True,
-            shell=True
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
+            start_new_session=os.name != "nt"
         )
+        timed_out = threading.Event()
+
+        def kill():
+            # The wrapper forks a JVM client, so take down the whole process group
+            timed_out.set()
+            try:
+                if os.name != "nt":
+                    os.killpg(process.pid, signal.SIGKILL)
+                else:
+                    process.kill()
+            except OSError:
+                pass
 
-    def _parse_build_output(self, output: str) -> List[Dict[str, str]]:
-        errors = []
-        # Sample match: > [ERROR] /path/to/Class.java:25: error: cannot find symbol
-        pattern = re.compile(r"> Task :.*?\n(.*?\.java):(\d+):\s+error:\s+(.*?)\n", re.MULTILINE)
+        watchdog = threading.Timer(self.timeout, kill)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            for line in process.stdout:
+                output.append(line)
+                parser.feed(line)
+            process.wait()
+        finally:
+            watchdog.cancel()
+        parser.close()
 
-        for match in pattern.finditer(output):
-            errors.append({
-                "file": match.group(1).strip(),
-                "line": match.group(2).strip(),
-                "error": match.group(3).strip()
-            })
+        if timed_out.is_set():
+            output.append(f"\nBUILD TIMED OUT after {self.timeout:.0f}s\n")
+        return {
+            "returncode": -1 if timed_out.is_set() else process.returncode,
+            "output": "".join(output),
+            "diagnostics": parser.diagnostics
+        }
 
-        return errors
+    def validate_build(self, on_diagnostic: Optional[Callable[[dict], None]] = None) -> Dict[str, any]:
+        """
+        Runs the build. `on_diagnostic` receives each diagnostic record as soon as Gradle
+        prints it; the result carries all of them ("diagnostics") and the errors ("errors").
+        """
+        with span("gradle.build", tasks=" ".join(self.tasks), mode=self.mode) as attrs:
+            result = self._validate_build(on_diagnostic)
+            attrs.update(success=result["build_success"], errors=len(result["errors"]))
+            return result
 
-    def validate_build(self) -> Dict[str, any]:
-        result = self._run_gradle_build()
-        output = result.stdout
+    def _validate_build(self, on_diagnostic: Optional[Callable[[dict], None]]) -> Dict[str, any]:
+        if self.gradle_cmd is None:
+            print("🚨 Neither gradlew nor gradle found; cannot validate the build")
+            return {"build_success": False, "errors": [], "diagnostics": [], "raw_output": "gradle not found", "mode": self.mode, "elapsed": 0.0}
 
-        if "BUILD SUCCESSFUL" in output:
+        start = time.monotonic()
+        offline = self.mode == "fast" and self.offline
+        configuration_cache = self.mode == "fast" and self._supports_configuration_cache()
+        print(f"🏗️ Gradle {' '.join(self.tasks)} ({self.mode} mode)")
+        result = self._run_gradle_build(self._command(offline, configuration_cache), on_diagnostic)
+        output = result["output"]
+
+        # Retry once without an optimisation the project cannot use
+        if result["returncode"] > 0:
+            retry = False
+            if offline and OFFLINE_MISS.search(output):
+                print("⚠️ Dependencies not cached for --offline; retrying online")
+                self.offline = offline = False
+                retry = True
+            if configuration_cache and CONFIGURATION_CACHE_PROBLEM.search(output):
+                print("⚠️ Build is not configuration-cache compatible; retrying without it")
+                self._configuration_cache = configuration_cache = False
+                retry = True
+            if retry:
+                result = self._run_gradle_build(self._command(offline, configuration_cache), on_diagnostic)
+                output = result["output"]
+
+        elapsed = time.monotonic() - start
+        diagnostics = result["diagnostics"]
+        if result["returncode"] == 0 and "BUILD SUCCESSFUL" in output:
+            print(f"✅ Gradle {' '.join(self.tasks)} succeeded in {elapsed:.1f}s")
             return {
                 "build_success": True,
                 "errors": [],
-                "raw_output": output
+                "diagnostics": diagnostics,
+                "raw_output": output,
+                "mode": self.mode,
+                "elapsed": elapsed
             }
 
-        parsed_errors = self._parse_build_output(output)
-
         return {
             "build_success": False,
-            "errors": parsed_errors,
-            "raw_output": output
+            "errors": [d for d in diagnostics if d["kind"] == "ERROR"],
+            "diagnostics": diagnostics,
+            "raw_output": output,
+            "mode": self.mode,
+            "elapsed": elapsed,
+            "timed_out": result["returncode"] == -1
         }
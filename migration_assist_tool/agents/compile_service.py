@@ -0,0 +1,216 @@
+# agents/compile_service.py
+
+import os
+import re
+import time
+import queue
+import atexit
+import shutil
+import threading
+import subprocess
+from typing import Dict, List, Optional
+from agents.build_diagnostics import make_diagnostic, parse_build_output
+from utils.tracing import span
+
+SERVER_SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools", "CompileServer.java")
+
+_shared_service: Optional["CompileService"] = None
+_shared_lock = threading.Lock()
+
+
+def get_compile_service() -> "CompileService":
+    """
+    Returns the process-wide compile service; the server JVM starts on first use.
+    """
+    global _shared_service
+    with _shared_lock:
+        if _shared_service is None:
+            _shared_service = CompileService()
+            atexit.register(_shared_service.close)
+        return _shared_service
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r'\\(.)', lambda m: {"n": "\n", "t": "\t"}.get(m.group(1), m.group(1)), value)
+
+
+def parse_javac_output(output: str) -> List[dict]:
+    """
+    Parses plain `javac` console output into the same diagnostic dicts the server returns.
+    """
+    return [dict(diagnostic, code="") for diagnostic in parse_build_output(output)]
+
+
+class CompileService:
+    """
+    Client for tools/CompileServer.java: one warm JVM that compiles batches of files
+    through javax.tools and returns structured per-file diagnostics.
+
+    Requests are serialized over the server's stdin/stdout. If the server cannot be
+    started (no JDK, launch failure) or dies twice, every later request falls back to a
+    plain `javac` subprocess with the same options, so callers always get an answer.
+    """
+
+    def __init__(self, java: Optional[str] = None, server_source: str = SERVER_SOURCE,
+                 startup_timeout: float = 60.0, compile_timeout: float = 300.0):
+        java_home = os.getenv("JAVA_HOME")
+        self.java = java or (os.path.join(java_home, "bin", "java") if java_home else "java")
+        self.javac = os.path.join(java_home, "bin", "javac") if java_home else "javac"
+        self.server_source = server_source
+        self.startup_timeout = startup_timeout
+        self.compile_timeout = compile_timeout
+        self.stats = {"server_compiles": 0, "javac_compiles": 0, "restarts": 0}
+
+        self._process: Optional[subprocess.Popen] = None
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._disabled = os.getenv("COMPILE_SERVER", "on").lower() in ("off", "0", "false")
+
+    def _start(self) -> bool:
+        if self._disabled:
+            return False
+        if not shutil.which(self.java) or not os.path.exists(self.server_source):
+            print("⚠️ Compile server unavailable (java or CompileServer.java not found); using javac")
+            self._disabled = True
+            return False
+        try:
+            self._process = subprocess.Popen(
+                [self.java, self.server_source],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                encoding="utf-8",
+                bufsize=1
+            )
+        except OSError as e:
+            print(f"⚠️ Could not launch compile server: {e}; using javac")
+            self._disabled = True
+            return False
+
+        # A reader thread lets every read honour a timeout
+        self._lines = queue.Queue()
+        process = self._process
+        threading.Thread(target=self._pump, args=(process, self._lines), name="compile-server-reader", daemon=True).start()
+
+        ready = self._read_line(self.startup_timeout)
+        if ready != "READY":
+            print(f"⚠️ Compile server failed to start ({ready or 'no response'}); using javac")
+            self._stop()
+            self._disabled = True
+            return False
+        print("☕ Compile server ready")
+        return True
+
+    @staticmethod
+    def _pump(process: subprocess.Popen, lines: "queue.Queue[Optional[str]]"):
+        for line in process.stdout:
+            lines.put(line.rstrip("\n"))
+        lines.put(None)
+
+    def _read_line(self, timeout: float) -> Optional[str]:
+        try:
+            return self._lines.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _stop(self):
+        if self._process is None:
+            return
+        try:
+            if self._process.poll() is None:
+                self._process.stdin.write("QUIT\n")
+                self._process.stdin.flush()
+                self._process.wait(timeout=5)
+        except Exception:
+            self._process.kill()
+        self._process = None
+
+    def _server_compile(self, files: List[str], options: List[str]) -> Optional[dict]:
+        if self._process is None or self._process.poll() is not None:
+            if self._process is not None:
+                self.stats["restarts"] += 1
+            if not self._start():
+                return None
+
+        request = ["BEGIN"] + [f"OPT {o}" for o in options] + [f"FILE {os.path.abspath(f)}" for f in files] + ["END"]
+        try:
+            self._process.stdin.write("\n".join(request) + "\n")
+            self._process.stdin.flush()
+        except OSError:
+            return self._server_failed("server closed its input")
+
+        diagnostics = []
+        deadline = time.monotonic() + self.compile_timeout
+        while True:
+            line = self._read_line(max(0.0, deadline - time.monotonic()))
+            if line is None:
+                return self._server_failed("no response")
+            if line.startswith("DIAG "):
+                kind, file, line_no, column, code, message = line[5:].split("\t", 5)
+                diagnostic = make_diagnostic(kind, _unescape(file), int(line_no), int(column), _unescape(message))
+                diagnostic["code"] = _unescape(code)
+                diagnostics.append(diagnostic)
+            elif line.startswith("RESULT "):
+                _, verdict, millis = line.split()
+                self._failures = 0
+                self.stats["server_compiles"] += 1
+                return {"success": verdict == "ok", "diagnostics": diagnostics, "backend": "server", "elapsed": int(millis) / 1000.0}
+
+    def _server_failed(self, reason: str) -> None:
+        self._failures += 1
+        print(f"⚠️ Compile server {reason}; restarting" if self._failures < 2 else f"⚠️ Compile server {reason}; falling back to javac")
+        if self._process is not None:
+            self._process.kill()
+            self._process = None
+        if self._failures >= 2:
+            self._disabled = True
+        return None
+
+    def _javac_compile(self, files: List[str], options: List[str]) -> dict:
+        start = time.monotonic()
+        try:
+            result = subprocess.run(
+                [self.javac] + options + list(files),
+                capture_output=True,
+                text=True,
+                timeout=self.compile_timeout
+            )
+            output = result.stdout + result.stderr
+            success = result.returncode == 0
+        except (OSError, subprocess.TimeoutExpired) as e:
+            output, success = str(e), False
+        with self._lock:
+            self.stats["javac_compiles"] += 1
+        diagnostics = parse_javac_output(output)
+        if not success and not diagnostics:
+            diagnostics.append(dict(make_diagnostic("ERROR", "", 0, 0, ""), code="", message=output.strip()))
+        return {"success": success, "diagnostics": diagnostics, "backend": "javac", "elapsed": time.monotonic() - start}
+
+    def compile(self, files: List[str], options: Optional[List[str]] = None) -> dict:
+        """
+        Compiles `files` together with the given javac options. Returns
+        {"success", "diagnostics": [{kind, file, line, column, code, message}],
+         "by_file": {path: [diagnostics]}, "backend": "server" | "javac", "elapsed"}.
+        """
+        options = list(options or [])
+        with span("compile.javac", files=len(files)) as attrs:
+            # Only the server protocol is serialized; fallback javac processes run in parallel
+            with self._lock:
+                result = None
+                while result is None and not self._disabled:
+                    result = self._server_compile(files, options)
+            if result is None:
+                result = self._javac_compile(files, options)
+            attrs.update(backend=result["backend"], success=result["success"], diagnostics=len(result["diagnostics"]))
+
+        by_file: Dict[str, List[dict]] = {}
+        for diagnostic in result["diagnostics"]:
+            by_file.setdefault(diagnostic["file"], []).append(diagnostic)
+        result["by_file"] = by_file
+        return result
+
+    def close(self):
+        with self._lock:
+            self._stop()
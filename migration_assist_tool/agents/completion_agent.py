@@ -2,7 +2,11 @@ import os
 from dotenv import load_dotenv
 from agents.fix_history_logger import FixHistoryLogger
 from agents.context_stitcher import ContextStitcherAgent
+from agents.symbol_index import get_symbol_index
+from utils.file_cache import read_text, write_text
 from utils.llm_loader import get_llm
+from utils.tracing import span
+from utils.response_cache import get_response_cache
 
 load_dotenv()
 
@@ -14,9 +18,17 @@ class CompletionAgent:
         self.reference_dir = reference_dir
 
         self.client = get_llm()
+        self.response_cache = get_response_cache()
         self.logger = FixHistoryLogger()
+        self.symbols = get_symbol_index(migrated_dir)
 
     def complete_missing_logic(self, target_path: str, source_paths: list, enterprise_refs: list, stitcher: ContextStitcherAgent):
+        with span("agent.complete", file=target_path) as attrs:
+            result = self._complete_missing_logic(target_path, source_paths, enterprise_refs, stitcher)
+            attrs["status"] = result["completion_log"]["status"]
+            return result
+
+    def _complete_missing_logic(self, target_path, source_paths, enterprise_refs, stitcher):
         full_target_path = os.path.join(self.migrated_dir, target_path)
 
         if not os.path.exists(full_target_path):
@@ -65,22 +77,18 @@ MIGRATED FILE:
 """
 
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a Java Spring Boot code completion agent."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2,
-                max_tokens=4000
-            )
+            messages = [
+                {"role": "system", "content": "You are a Java Spring Boot code completion agent."},
+                {"role": "user", "content": prompt}
+            ]
+            completed_code = self.response_cache.get_or_call(
+                self.client.model, 0.2, messages, lambda: self._complete(messages), max_tokens=4000
+            ).strip()
 
-            completed_code = response.choices[0].message.content.strip()
-
-            with open(full_target_path, "w", encoding="utf-8") as f:
-                f.write(completed_code)
+            write_text(full_target_path, completed_code)
 
             self._cleanup_java_file(full_target_path)
+            self.symbols.update_file(target_path)
 
             self.logger.log_fix(
                 file_path=target_path,
@@ -88,7 +96,7 @@ MIGRATED FILE:
                 status="success",
                 original_code=original_code,
                 fixed_code=completed_code,
-                metadata={"model": "gpt-4o"}
+                metadata={"model": self.client.model, "token_usage": context["token_usage"]}
             )
 
             return {
@@ -118,10 +126,11 @@ MIGRATED FILE:
                 }
             }
 
+    def _complete(self, messages: list) -> str:
+        return self.client.complete(messages, temperature=0.2, max_tokens=4000)
+
     def _cleanup_java_file(self, filepath):
         if filepath.endswith(".java") and os.path.exists(filepath):
-            with open(filepath, "r", encoding="utf-8") as f:
-                lines = f.readlines()
+            lines = read_text(filepath).splitlines(keepends=True)
             cleaned = [line for line in lines if line.strip() not in ("```java", "```")]
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.writelines(cleaned)
+            write_text(filepath, "".join(cleaned))
@@ -0,0 +1,146 @@
+# agents/context_packer.py
+
+import os
+import re
+import math
+from typing import Dict, List, Optional, Set, Tuple
+from agents.java_parser import parse_java
+from agents.method_resolver import identifier_tokens
+from agents.reference_chunker import java_chunks
+from utils.tokenizer import get_encoder
+
+IDENTIFIER = re.compile(r'[A-Za-z_]\w*')
+LINES_PER_CHUNK = 40
+
+DEFAULT_BUDGETS = {
+    "legacy_code": int(os.getenv("CONTEXT_LEGACY_TOKENS", "6000")),
+    "enterprise_code": int(os.getenv("CONTEXT_ENTERPRISE_TOKENS", "2000")),
+    "reference_code": int(os.getenv("CONTEXT_REFERENCE_TOKENS", "3000"))
+}
+
+
+def target_symbols(code: str) -> Dict[str, Set[str]]:
+    """
+    What a target file is about: the names it declares and the types it mentions
+    ("names"), plus their lower-case word parts ("tokens") for looser matching.
+    """
+    parsed = parse_java(code)
+    names = {t["name"] for t in parsed["types"]}
+    names.update(m["name"] for m in parsed["methods"])
+    for field in parsed["fields"]:
+        names.add(field["name"])
+        names.update(IDENTIFIER.findall(field["type"]))
+    names.update(word for word in IDENTIFIER.findall(code) if word[0].isupper())
+    tokens = set()
+    for name in names:
+        tokens.update(identifier_tokens(name))
+    return {"names": names, "tokens": tokens}
+
+
+def _line_chunks(code: str) -> List[dict]:
+    chunks, start, lines = [], 0, 0
+    for match in re.finditer(r'\n', code):
+        lines += 1
+        if lines == LINES_PER_CHUNK:
+            chunks.append({"name": "", "start": start, "end": match.end()})
+            start, lines = match.end(), 0
+    if start < len(code):
+        chunks.append({"name": "", "start": start, "end": len(code)})
+    return chunks
+
+
+def _indent(code: str, offset: int) -> str:
+    prefix = code[code.rfind("\n", 0, offset) + 1:offset]
+    return prefix if not prefix.strip() else ""
+
+
+class ContextPacker:
+    """
+    Packs prompt sections under hard token budgets.
+
+    Each document is split at member boundaries (class header, then one chunk per method,
+    initializer or nested type; other files by line blocks). Chunks are ranked across all
+    documents of a section by how many of the target's symbols they mention, per token, and
+    taken best-first while they fit. Included chunks are re-assembled in source order with
+    a marker where members were left out, so every section stays valid-looking Java.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, model_name: str = "gpt-4"):
+        self.budgets = dict(DEFAULT_BUDGETS, **(budgets or {}))
+        self.encoder = get_encoder(model_name)
+
+    def _tokens(self, text: str) -> int:
+        return len(self.encoder.encode(text))
+
+    def _score(self, text: str, symbols: Dict[str, Set[str]], header: bool) -> float:
+        words = set(IDENTIFIER.findall(text))
+        exact = len(words & symbols["names"])
+        parts = set()
+        for word in words:
+            parts.update(identifier_tokens(word))
+        loose = len(parts & symbols["tokens"]) / (len(symbols["tokens"]) or 1)
+        # Headers carry package, imports and fields, which make the members readable
+        return 2.0 * exact + loose + (1.0 if header else 0.0)
+
+    def pack(self, section: str, documents: List[Tuple[str, str]], symbols: Dict[str, Set[str]]) -> Tuple[str, dict]:
+        """
+        Returns (text, usage) for one section. `documents` is [(path, code)], in caller's
+        priority order for ties; usage is {"tokens", "budget", "chunks", "included"}.
+        """
+        budget = self.budgets.get(section, 0)
+        candidates = []
+        for doc_index, (path, code) in enumerate(documents):
+            chunks = java_chunks(code) if path.endswith(".java") else _line_chunks(code)
+            for chunk_index, chunk in enumerate(chunks):
+                text = code[chunk["start"]:chunk["end"]]
+                if not text.strip():
+                    continue
+                tokens = self._tokens(text)
+                score = self._score(text, symbols, header=chunk_index == 0 and path.endswith(".java"))
+                candidates.append({
+                    "doc": doc_index, "start": chunk["start"], "end": chunk["end"],
+                    "tokens": tokens, "rank": score / math.sqrt(tokens + 1), "order": len(candidates)
+                })
+
+        # Best relevance per token first; a chunk that does not fit is skipped, never cut
+        candidates.sort(key=lambda c: (-c["rank"], c["order"]))
+        selected, used = [], 0
+        for candidate in candidates:
+            if used + candidate["tokens"] <= budget:
+                selected.append(candidate)
+                used += candidate["tokens"]
+
+        # Omission markers add a few tokens; drop the weakest chunks until the text fits
+        while True:
+            text = self._assemble(documents, selected)
+            tokens = self._tokens(text) if text else 0
+            if tokens <= budget or not selected:
+                break
+            selected.pop()
+
+        return text, {"tokens": tokens, "budget": budget, "chunks": len(candidates), "included": len(selected)}
+
+    def _assemble(self, documents: List[Tuple[str, str]], selected: List[dict]) -> str:
+        chosen = {(c["doc"], c["start"]) for c in selected}
+        blocks = []
+        for doc_index in sorted({c["doc"] for c in selected}):
+            path, code = documents[doc_index]
+            chunks = java_chunks(code) if path.endswith(".java") else _line_chunks(code)
+            out, pos, omitting = "", 0, False
+            for chunk in chunks:
+                if (doc_index, chunk["start"]) in chosen:
+                    out += _indent(code, chunk["start"]) if omitting else code[pos:chunk["start"]]
+                    out += code[chunk["start"]:chunk["end"]]
+                    omitting = False
+                elif not omitting and code[chunk["start"]:chunk["end"]].strip():
+                    # One marker per run of left-out chunks
+                    out = out.rstrip(" \t")
+                    if out and not out.endswith("\n"):
+                        out += "\n"
+                    out += _indent(code, chunk["start"]) + "// ... omitted ...\n"
+                    omitting = True
+                pos = chunk["end"]
+            # Whatever follows the last chunk is closing braces
+            out += code[pos:].lstrip(" \t") if omitting else code[pos:]
+            blocks.append(out.strip("\n"))
+        return "\n\n".join(blocks)
@@ -1,44 +1,50 @@
 import os
-from agents.reference_promoter import ReferencePromoterAgent
+from agents.context_packer import ContextPacker, target_symbols
+from agents.reference_promoter import get_shared_promoter
+from utils.file_cache import read_text
+from utils.tracing import span
 
 class ContextStitcherAgent:
-    def __init__(self, legacy_dir, migrated_dir, enterprise_dir="", reference_dir=""):
+    def __init__(self, legacy_dir, migrated_dir, enterprise_dir="", reference_dir="", budgets=None):
         self.legacy_dir = legacy_dir
         self.migrated_dir = migrated_dir
         self.enterprise_dir = enterprise_dir
         self.reference_dir = reference_dir
 
-        self.promoter = None
-        if reference_dir:
-            self.promoter = ReferencePromoterAgent(reference_dir)
-            self.promoter.build_embedding_index()
+        self.promoter = get_shared_promoter(reference_dir) if reference_dir else None
+        # Per-section token ceilings (legacy_code, enterprise_code, reference_code)
+        self.packer = ContextPacker(budgets)
 
     def build_context(self, source_paths, target_path, enterprise_refs):
-        migrated_code = self._read_file(self.migrated_dir, target_path)
-        context = {
-            "legacy_code": self._read_files(self.legacy_dir, source_paths),
-            "migrated_code": migrated_code,
-            "enterprise_code": self._read_files(self.enterprise_dir, enterprise_refs) if self.enterprise_dir else "",
-            "reference_code": self._get_reference_code(migrated_code) if self.promoter else ""
-        }
-        return context
+        with span("context.build", file=target_path, sources=len(source_paths)) as attrs:
+            migrated_code = self._read_file(self.migrated_dir, target_path)
+            symbols = target_symbols(migrated_code)
+
+            sections = {
+                "legacy_code": self._read_files(self.legacy_dir, source_paths),
+                "enterprise_code": self._read_files(self.enterprise_dir, enterprise_refs) if self.enterprise_dir else [],
+                "reference_code": self._get_reference_code(migrated_code) if self.promoter else []
+            }
+            context = {"migrated_code": migrated_code, "token_usage": {}}
+            for section, documents in sections.items():
+                context[section], context["token_usage"][section] = self.packer.pack(section, documents, symbols)
+            attrs["tokens"] = sum(usage["tokens"] for usage in context["token_usage"].values())
+            return context
 
     def _read_files(self, base_dir, paths):
-        code_blocks = []
+        documents = []
         for path in paths:
             full_path = os.path.join(base_dir, path)
             if os.path.exists(full_path):
-                with open(full_path, "r", encoding="utf-8") as f:
-                    code_blocks.append(f.read())
-        return "\n\n".join(code_blocks)
+                documents.append((path, read_text(full_path)))
+        return documents
 
     def _read_file(self, base_dir, path):
         full_path = os.path.join(base_dir, path)
         if os.path.exists(full_path):
-            with open(full_path, "r", encoding="utf-8") as f:
-                return f.read()
+            return read_text(full_path)
         return ""
 
     def _get_reference_code(self, migrated_code):
-        top_matches = self.promoter.search_similar_files(migrated_code, top_k=2, max_tokens=3000)
-        return "\n\n".join(content for _, content in top_matches)
+        # A few extra candidates; the packer keeps whichever fit the reference budget best
+        return self.promoter.search_similar_files(migrated_code, top_k=4, max_tokens=self.packer.budgets["reference_code"])
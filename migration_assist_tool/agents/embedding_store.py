@@ -0,0 +1,277 @@
+# agents/embedding_store.py
+
+import os
+import glob
+import json
+import uuid
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+STORE_VERSION = 2
+FILE_COLUMNS = ["path", "hash", "tokens", "bytes", "size", "mtime_ns", "inode"]
+CHUNK_COLUMNS = ["file", "start", "end", "tokens", "name"]
+
+
+class EmbeddingStore:
+    """
+    On-disk embedding index: a float32 `.npy` matrix opened as a read-only memory map,
+    plus a compact JSON sidecar. The sidecar has one metadata row per indexed file and
+    one row per chunk of that file; chunk row i describes matrix row i.
+
+    Opening the store only parses the sidecar; vectors are paged in by the OS on demand
+    and shared between every process that maps the same file. Each save writes a new
+    generation-stamped matrix file first and then atomically swaps in the sidecar that
+    names it, so the sidecar always describes a complete matrix, even after a crash
+    between the two. Superseded matrix files are deleted afterwards.
+    """
+
+    def __init__(self, base_path: str):
+        self.base_path = base_path
+        # Stores written before matrices were generation-stamped; still readable
+        self.matrix_path = base_path + ".npy"
+        self.meta_path = base_path + ".meta.json"
+
+        self.files: Dict[str, dict] = {}
+        self.dim = 0
+        self.version = 0
+        self.generation = ""
+        self.matrix_name = ""
+
+        self._mapped = np.zeros((0, 0), dtype=np.float32)
+        self._pending: Dict[str, np.ndarray] = {}
+        self._dirty = False
+        self._meta_dirty = False
+        self._view: Optional[Tuple[List[Tuple[str, dict]], np.ndarray]] = None
+        self._columns: Dict[str, np.ndarray] = {}
+        self.load()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.meta_path)
+
+    def _generation_matrix_path(self, generation: str) -> str:
+        return f"{self.base_path}.{generation}.npy"
+
+    def load(self):
+        self.files = {}
+        self._pending = {}
+        self._dirty = False
+        self._meta_dirty = False
+        self._view = None
+        self._columns = {}
+        self._mapped = np.zeros((0, 0), dtype=np.float32)
+        self.generation = ""
+        self.matrix_name = ""
+        self.version += 1
+
+        if not self.exists():
+            return
+
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != STORE_VERSION:
+            print(f"⚠️ Embedding store {self.meta_path} uses an older format; it will be rebuilt.")
+            return
+
+        matrix_path = os.path.join(os.path.dirname(self.meta_path), meta["matrix"]) if meta.get("matrix") else self.matrix_path
+        chunk_count = len(meta["chunks"]["rows"])
+        mapped = None
+        if chunk_count:
+            try:
+                mapped = np.load(matrix_path, mmap_mode="r")
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Embedding matrix {matrix_path} is unreadable ({e}); the store will be rebuilt.")
+                return
+            # A sidecar must describe exactly the matrix it names; anything else would misalign rows
+            if mapped.ndim != 2 or mapped.shape[0] != chunk_count or mapped.shape[1] != meta.get("dim", 0):
+                print(f"⚠️ Embedding matrix {matrix_path} has shape {mapped.shape}, but its sidecar describes "
+                      f"{chunk_count} x {meta.get('dim', 0)}; the store will be rebuilt.")
+                return
+
+        self.dim = meta.get("dim", 0)
+        self.generation = meta.get("generation", "")
+        self.matrix_name = os.path.basename(matrix_path)
+        file_columns = meta["files"]["columns"]
+        paths = []
+        for values in meta["files"]["rows"]:
+            record = dict(zip(file_columns, values))
+            path = record.pop("path")
+            record["chunks"] = []
+            self.files[path] = record
+            paths.append(path)
+
+        chunk_columns = meta["chunks"]["columns"]
+        for row, values in enumerate(meta["chunks"]["rows"]):
+            chunk = dict(zip(chunk_columns, values))
+            chunk["row"] = row
+            self.files[paths[chunk.pop("file")]]["chunks"].append(chunk)
+
+        if mapped is not None:
+            self._mapped = mapped
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.files
+
+    def get(self, path: str) -> Optional[dict]:
+        return self.files.get(path)
+
+    def put(self, path: str, vectors, chunks: List[dict], content_hash: str, **metadata):
+        """
+        Replaces every chunk of `path`. `vectors` holds one row per entry of `chunks`
+        (dicts with start, end, tokens and name); extra keyword arguments (tokens,
+        bytes, size, mtime_ns, inode) are stored as file-level sidecar metadata.
+        """
+        if not chunks:
+            # Files with nothing to embed are still recorded so they are not re-read on every build
+            vectors = np.zeros((0, self.dim), dtype=np.float32)
+        else:
+            vectors = np.asarray(vectors, dtype=np.float32).reshape(len(chunks), -1)
+            if not self.dim:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dim}")
+
+        self._pending[path] = vectors
+        self.files[path] = {
+            "hash": content_hash,
+            **metadata,
+            "chunks": [{**chunk, "row": None} for chunk in chunks]
+        }
+        self._mark_dirty()
+
+    def update(self, path: str, **fields):
+        """
+        Updates file-level sidecar metadata for an indexed path without touching its vectors.
+        """
+        self.files[path].update(fields)
+        self._meta_dirty = True
+
+    def remove(self, path: str):
+        if path in self.files:
+            del self.files[path]
+            self._pending.pop(path, None)
+            self._mark_dirty()
+
+    @property
+    def row_count(self) -> int:
+        return sum(len(record["chunks"]) for record in self.files.values())
+
+    def view(self) -> Tuple[List[Tuple[str, dict]], np.ndarray]:
+        """
+        Returns (rows, matrix) where rows[i] is the (path, chunk) pair for matrix row i.
+        With no unsaved changes the matrix is the memory map itself, so this is free.
+        """
+        if self._view is not None:
+            return self._view
+
+        rows = [(path, chunk) for path, record in self.files.items() for chunk in record["chunks"]]
+        if not self._dirty:
+            self._view = (rows, self._mapped)
+            return self._view
+
+        matrix = np.empty((len(rows), self.dim), dtype=np.float32)
+        mapped_slots, mapped_rows = [], []
+        slot = 0
+        for path, record in self.files.items():
+            count = len(record["chunks"])
+            if path in self._pending:
+                matrix[slot:slot + count] = self._pending[path]
+            else:
+                mapped_slots.extend(range(slot, slot + count))
+                mapped_rows.extend(chunk["row"] for chunk in record["chunks"])
+            slot += count
+        if mapped_slots:
+            matrix[mapped_slots] = self._mapped[mapped_rows]
+
+        self._view = (rows, matrix)
+        return self._view
+
+    def column(self, name: str, missing: float = np.nan) -> np.ndarray:
+        """
+        Returns one chunk metadata column as a float64 array aligned with the rows of view().
+        Values that were never recorded are filled with `missing`.
+        """
+        if name not in self._columns:
+            rows, _ = self.view()
+            values = [chunk.get(name) for _, chunk in rows]
+            self._columns[name] = np.array([missing if v is None else v for v in values], dtype=np.float64)
+        return self._columns[name]
+
+    def save(self):
+        if not self._dirty:
+            if self._meta_dirty:
+                self._write_sidecar()
+                self._meta_dirty = False
+            return
+
+        rows, matrix = self.view()
+        directory = os.path.dirname(self.base_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        for row, (_, chunk) in enumerate(rows):
+            chunk["row"] = row
+
+        # A new generation names the new matrix file and tells derived structures (e.g. the ANN index) to rebuild
+        generation = uuid.uuid4().hex
+        matrix_path = self._generation_matrix_path(generation)
+        tmp_matrix = matrix_path + ".tmp"
+        with open(tmp_matrix, "wb") as f:
+            np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_matrix, matrix_path)
+
+        # Only now does the sidecar point at the new matrix; until then the old pair stays intact
+        self.generation = generation
+        self.matrix_name = os.path.basename(matrix_path)
+        self._write_sidecar()
+
+        # Drop our own mapping before deleting the file underneath it
+        self._mapped = np.zeros((0, 0), dtype=np.float32)
+        self._view = None
+        self._remove_stale_matrices(matrix_path)
+
+        self._pending = {}
+        self._dirty = False
+        self._meta_dirty = False
+        self._mapped = np.load(matrix_path, mmap_mode="r") if rows else np.zeros((0, 0), dtype=np.float32)
+        self.version += 1
+
+    def _remove_stale_matrices(self, current: str):
+        for path in glob.glob(glob.escape(self.base_path) + ".*.npy") + [self.matrix_path]:
+            if os.path.abspath(path) != os.path.abspath(current) and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Still mapped by another process (Windows); removed by a later save
+                    pass
+
+    def _write_sidecar(self):
+        file_rows, chunk_rows = [], []
+        for index, (path, record) in enumerate(self.files.items()):
+            file_rows.append([path] + [record.get(col) for col in FILE_COLUMNS[1:]])
+            for chunk in record["chunks"]:
+                chunk_rows.append([index] + [chunk.get(col) for col in CHUNK_COLUMNS[1:]])
+
+        tmp_meta = self.meta_path + ".tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": STORE_VERSION,
+                "dim": self.dim,
+                "generation": self.generation,
+                "matrix": self.matrix_name,
+                "files": {"columns": FILE_COLUMNS, "rows": file_rows},
+                "chunks": {"columns": CHUNK_COLUMNS, "rows": chunk_rows}
+            }, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_meta, self.meta_path)
+
+    def _mark_dirty(self):
+        self._dirty = True
+        self._view = None
+        self._columns = {}
+        self.version += 1
@@ -1,23 +1,41 @@
 import os
 import re
+import threading
 from dotenv import load_dotenv
 from agents.fix_history_logger import FixHistoryLogger
 from agents.context_stitcher import ContextStitcherAgent
+from agents.java_parser import parse_java
+from agents.method_resolver import MethodResolver, call_arity
+from agents.symbol_index import get_symbol_index
+from utils.file_cache import read_text, write_text
 from utils.llm_loader import get_llm
+from utils.tracing import span
+from utils.response_cache import get_response_cache
 
 load_dotenv()
 
 class FixAndCompileAgent:
-    def __init__(self, legacy_dir, migrated_dir, enterprise_dir="", reference_dir=""):
+    def __init__(self, legacy_dir, migrated_dir, enterprise_dir="", reference_dir="", llm_concurrency=None):
         self.legacy_dir = legacy_dir
         self.migrated_dir = migrated_dir
         self.enterprise_dir = enterprise_dir
         self.reference_dir = reference_dir
 
         self.client = get_llm()
+        self.response_cache = get_response_cache()
+        # Caps in-flight LLM requests independently of how many fix workers share this agent
+        self.llm_slots = threading.BoundedSemaphore(llm_concurrency or int(os.getenv("LLM_CONCURRENCY", "4")))
         self.logger = FixHistoryLogger()
+        self.symbols = get_symbol_index(migrated_dir)
+        self.resolver = MethodResolver(self.client, llm_slots=self.llm_slots)
 
-    def fix_file(self, target_path, source_paths, enterprise_refs, stitcher: ContextStitcherAgent):
+    def fix_file(self, target_path, source_paths, enterprise_refs, stitcher: ContextStitcherAgent, diagnostics=None):
+        with span("agent.fix", file=target_path, errors=len(diagnostics or [])) as attrs:
+            result = self._fix_file(target_path, source_paths, enterprise_refs, stitcher, diagnostics)
+            attrs["status"] = result["fix_log"].get("status", "missing")
+            return result
+
+    def _fix_file(self, target_path, source_paths, enterprise_refs, stitcher, diagnostics):
         assert self.legacy_dir not in target_path, "❌ Attempted to write to legacy directory. Aborting."
 
         migrated_file_path = os.path.join(self.migrated_dir, target_path)
@@ -36,23 +54,24 @@ class FixAndCompileAgent:
         updated_code, injection_fixes = self._insert_missing_injections(updated_code)
 
         if reference_fixes or injection_fixes:
-            with open(migrated_file_path, "w", encoding="utf-8") as f:
-                f.write(updated_code)
+            write_text(migrated_file_path, updated_code)
             self._cleanup_java_file(migrated_file_path)
+            self.symbols.update_file(target_path)
 
-        prompt = self._build_prompt(context, updated_code)
+        prompt = self._build_prompt(context, updated_code, diagnostics)
 
         try:
-            response = self.client.invoke([
+            messages = [
                 {"role": "system", "content": "You are a helpful Java Spring Boot migration bot."},
                 {"role": "user", "content": prompt}
-            ])
-
-            fixed_code = response.content.strip()
-            with open(migrated_file_path, "w", encoding="utf-8") as f:
-                f.write(fixed_code)
+            ]
+            fixed_code = self.response_cache.get_or_call(
+                self.client.model, 0.2, messages, lambda: self._invoke(messages)
+            ).strip()
+            write_text(migrated_file_path, fixed_code)
 
             self._cleanup_java_file(migrated_file_path)
+            self.symbols.update_file(target_path)
 
             self.logger.log_fix(
                 file_path=target_path,
@@ -62,7 +81,8 @@ class FixAndCompileAgent:
                 fixed_code=fixed_code,
                 metadata={
                     "reference_fixes": reference_fixes,
-                    "injection_fixes": injection_fixes
+                    "injection_fixes": injection_fixes,
+                    "token_usage": context["token_usage"]
                 }
             )
 
@@ -95,40 +115,55 @@ class FixAndCompileAgent:
                 "fixed_code": ""
             }
 
+    def _invoke(self, messages: list) -> str:
+        with self.llm_slots:
+            return self.client.complete(messages, temperature=0.2)
+
     def _insert_missing_injections(self, code: str) -> tuple[str, list]:
-        lines = code.splitlines()
-        declared_fields = re.findall(r'private\s+(\w+)\s+(\w+);', code)
-        declared_vars = {var for _, var in declared_fields}
+        parsed = parse_java(code)
+        top_level = [t for t in parsed["types"] if t["parent"] is None]
+        if not top_level:
+            return code, []
+
+        declared_vars = {field["name"] for field in parsed["fields"]}
         used_vars = re.findall(r'(\w+)\.', code)
 
         missing = set(used_vars) - declared_vars
+        injections = []
         fixes = []
 
         for var in missing:
             guessed_class = var[0].upper() + var[1:]  # e.g., userService -> UserService
             class_file = self._find_class_file(guessed_class)
             if class_file:
-                inject_line = f"    @Autowired\n    private {guessed_class} {var};"
-                for idx, line in enumerate(lines):
-                    if line.strip().startswith("public class"):
-                        lines.insert(idx + 1, inject_line)
-                        fixes.append({"field": var, "injected_class": guessed_class})
-                        break
-        return "\n".join(lines), fixes
+                injections.append(f"    @Autowired\n    private {guessed_class} {var};")
+                fixes.append({"field": var, "injected_class": guessed_class})
+
+        if not injections:
+            return code, []
+        # Insert on the line after the first type declaration's opening brace
+        insert_at = code.find("\n", top_level[0]["body_start"])
+        insert_at = len(code) if insert_at == -1 else insert_at + 1
+        return code[:insert_at] + "\n".join(injections) + "\n" + code[insert_at:], fixes
 
     def _cleanup_java_file(self, filepath):
         if filepath.endswith(".java") and os.path.exists(filepath):
-            with open(filepath, "r", encoding="utf-8") as f:
-                lines = f.readlines()
+            lines = read_text(filepath).splitlines(keepends=True)
             ignore_starts = ("```", "// Here", "Here is", "/*", "This method", "#", "```java", "-")
             cleaned = [
                 line for line in lines
                 if not any(line.strip().startswith(prefix) for prefix in ignore_starts)
             ]
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.writelines(cleaned)
-
-    def _build_prompt(self, context, migrated_code):
+            write_text(filepath, "".join(cleaned))
+
+    def _build_prompt(self, context, migrated_code, diagnostics=None):
+        errors = ""
+        if diagnostics:
+            lines = [
+                f"line {d['line']}: {d['message']}" + (f" (symbol: {d['symbol']})" if d["symbol"] else "")
+                for d in diagnostics
+            ]
+            errors = "COMPILER ERRORS:\n" + "\n".join(lines) + "\n\n"
         return f"""You are a Java code migration assistant.
 
 Your job is to complete or correct the 'MIGRATED FILE'.
@@ -145,53 +180,44 @@ ENTERPRISE REFERENCES:
 REFERENCE CODE:
 {context['reference_code']}
 
-MIGRATED FILE:
+{errors}MIGRATED FILE:
 {migrated_code}
 """
 
     def _resolve_class_and_method_links(self, code: str) -> tuple[str, list]:
         applied_fixes = []
-        injected = re.findall(r'@Autowired\s+private\s+(\w+)\s+(\w+);', code)
+        injected = [
+            (field["type"], field["name"])
+            for field in parse_java(code)["fields"] if "Autowired" in field["annotations"]
+        ]
         for class_name, var_name in injected:
-            class_file = self._find_class_file(class_name)
-            if not class_file:
+            class_info = self.symbols.get_class(class_name)
+            if not class_info:
                 continue
-            class_path = os.path.join(self.migrated_dir, class_file)
-            if os.path.exists(class_path):
-                with open(class_path, "r", encoding="utf-8") as f:
-                    class_code = f.read()
-                available_methods = re.findall(r'public\s+\w+\s+(\w+)\s*\(', class_code)
-                calls = re.findall(rf'{var_name}\.(\w+)\(', code)
-                for call in calls:
-                    if call not in available_methods:
-                        suggestion = self._resolve_method_fallback(call, class_code)
-                        if suggestion and suggestion != call:
-                            code = code.replace(f"{var_name}.{call}(", f"{var_name}.{suggestion}(")
-                            applied_fixes.append({
-                                "var": var_name,
-                                "class": class_name,
-                                "method": call,
-                                "suggested_method": suggestion
-                            })
+            available_methods = class_info["methods"]
+            candidates = [sig for sig in class_info["signatures"] if sig["name"] in available_methods]
+            resolved = set()
+            for call in re.finditer(rf'\b{var_name}\.(\w+)\s*\(', code):
+                method = call.group(1)
+                if method in available_methods or method in resolved:
+                    continue
+                resolved.add(method)
+                arity = call_arity(code, call.end() - 1)
+                suggestion = self._resolve_method_fallback(method, class_name, candidates, arity)
+                if suggestion and suggestion != method:
+                    applied_fixes.append({
+                        "var": var_name,
+                        "class": class_name,
+                        "method": method,
+                        "suggested_method": suggestion
+                    })
+            for fix in applied_fixes:
+                if fix["var"] == var_name:
+                    code = re.sub(rf'\b{var_name}\.{fix["method"]}(\s*\()', rf'{var_name}.{fix["suggested_method"]}\1', code)
         return code, applied_fixes
 
     def _find_class_file(self, class_name: str) -> str | None:
-        for root, _, files in os.walk(self.migrated_dir):
-            for f in files:
-                if f == class_name + ".java":
-                    return os.path.relpath(os.path.join(root, f), self.migrated_dir)
-        return None
-
-    def _resolve_method_fallback(self, missing_method: str, class_code: str) -> str | None:
-        try:
-            prompt = f"""In the following Java class, find the most semantically similar method name to '{missing_method}':
-
-{class_code}
+        return self.symbols.find_class(class_name)
 
-Only return the method name. No explanation."""
-            response = self.client.invoke([
-                {"role": "user", "content": prompt}
-            ])
-            return response.content.strip()
-        except Exception:
-            return None
+    def _resolve_method_fallback(self, missing_method: str, class_name: str, candidates: list, arity: int | None = None) -> str | None:
+        return self.resolver.resolve(class_name, missing_method, candidates, arity)
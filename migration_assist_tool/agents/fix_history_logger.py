@@ -1,11 +1,182 @@
 import os
 import json
+import glob
+import queue
+import atexit
+import sqlite3
+import threading
 from datetime import datetime
+from typing import Dict, List
+
+_shared_stores: Dict[str, "FixHistoryStore"] = {}
+_shared_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fixes (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    file TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    status TEXT NOT NULL,
+    original_code TEXT,
+    fixed_code TEXT,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fix_types (
+    fix_id INTEGER NOT NULL,
+    file TEXT NOT NULL,
+    fix_type TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fixes_file ON fixes (file);
+CREATE INDEX IF NOT EXISTS fixes_agent_status ON fixes (agent, status);
+CREATE INDEX IF NOT EXISTS fix_types_type ON fix_types (fix_type);
+CREATE INDEX IF NOT EXISTS fix_types_file ON fix_types (file);
+"""
+
+
+def get_history_store(log_dir: str) -> "FixHistoryStore":
+    """
+    Returns the process-wide history store for `log_dir`; its writer thread starts on first use.
+    """
+    key = os.path.abspath(log_dir)
+    with _shared_lock:
+        store = _shared_stores.get(key)
+        if store is None:
+            store = FixHistoryStore(os.path.join(log_dir, "history.sqlite"))
+            _shared_stores[key] = store
+            atexit.register(store.close)
+        return store
+
+
+class FixHistoryStore:
+    """
+    Append-only fix history in SQLite (WAL mode).
+
+    log_fix callers only enqueue; one background writer drains the queue and inserts
+    whole batches per transaction, so logging never blocks a fix worker on disk I/O and
+    a crash loses at most the unflushed tail, never earlier history. Queries flush first
+    and then read through their own connection.
+    """
+
+    def __init__(self, path: str, batch_size: int = 500):
+        self.path = path
+        self.batch_size = batch_size
+        self._queue: "queue.Queue" = queue.Queue()
+        self._read_lock = threading.Lock()
+        # Guards _closed together with enqueueing, so no entry can land behind the stop sentinel
+        self._queue_lock = threading.Lock()
+        self._closed = False
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        self._import_json_history(conn, directory)
+        conn.close()
+
+        self._reader = self._connect()
+        self._writer = threading.Thread(target=self._write_loop, name="fix-history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _import_json_history(self, conn: sqlite3.Connection, directory: str):
+        # One-time carry-over of the per-file JSON histories written by earlier versions
+        if conn.execute("SELECT COUNT(*) FROM fixes").fetchone()[0]:
+            return
+        entries = []
+        for json_path in sorted(glob.glob(os.path.join(directory or ".", "*.json"))):
+            file_path = os.path.splitext(os.path.basename(json_path))[0].replace("__", "/")
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    entries.extend(dict(entry, file=file_path) for entry in json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Skipping unreadable fix history {json_path}: {e}")
+        if entries:
+            self._insert(conn, entries)
+            print(f"📥 Imported {len(entries)} fix history entries into {self.path}")
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, entries: List[dict]):
+        with conn:
+            for entry in entries:
+                metadata = entry.get("metadata") or {}
+                cursor = conn.execute(
+                    "INSERT INTO fixes (timestamp, file, agent, status, original_code, fixed_code, metadata) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (entry["timestamp"], entry["file"], entry["agent"], entry["status"],
+                     entry.get("original_code"), entry.get("fixed_code"), json.dumps(metadata, default=str))
+                )
+                conn.executemany(
+                    "INSERT INTO fix_types (fix_id, file, fix_type) VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, entry["file"], fix_type) for fix_type in metadata.get("fix_types", [])]
+                )
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            entry = self._queue.get()
+            batch = [entry]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            entries = [e for e in batch if e is not None]
+            try:
+                if entries:
+                    self._insert(conn, entries)
+            except sqlite3.Error as e:
+                print(f"⚠️ Could not write {len(entries)} fix history entries: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if None in batch:
+                conn.close()
+                return
+
+    def append(self, entry: dict):
+        with self._queue_lock:
+            if not self._closed:
+                self._queue.put(entry)
+                return
+        # Late entries (after close began) are written synchronously once the writer has drained
+        self._writer.join()
+        with self._read_lock:
+            self._insert(self._reader, [entry])
+
+    def flush(self):
+        """
+        Blocks until every entry logged so far is committed.
+        """
+        if self._closed:
+            self._writer.join()
+        else:
+            self._queue.join()
+
+    def query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        self.flush()
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def close(self):
+        with self._queue_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._writer.join()
+
 
 class FixHistoryLogger:
     def __init__(self, log_dir="logs/fix_history"):
         self.log_dir = log_dir
-        os.makedirs(self.log_dir, exist_ok=True)
+        self.store = get_history_store(log_dir)
 
     def log_fix(
         self,
@@ -17,28 +188,21 @@ class FixHistoryLogger:
         metadata: dict = None,
     ):
         timestamp = datetime.utcnow().isoformat()
-        filename = file_path.replace("/", "__").replace("\\", "__")
-        log_path = os.path.join(self.log_dir, f"{filename}.json")
-
-        # Load existing history if present
-        history = []
-        if os.path.exists(log_path):
-            with open(log_path, "r", encoding="utf-8") as f:
-                history = json.load(f)
 
         # Prepare fix log entry
         fix_entry = {
             "timestamp": timestamp,
+            "file": file_path.replace("\\", "/"),
             "agent": agent,
             "status": status,
             "original_code": original_code[:2000] if original_code else None,
             "fixed_code": fixed_code[:2000] if fixed_code else None,
-            "metadata": metadata or {}
+            "metadata": dict(metadata or {})
         }
 
         # Detect and tag fix types automatically
-        fix_types = fix_entry["metadata"].get("fix_types", [])
-        ref_fixes = metadata.get("reference_fixes") if metadata else []
+        fix_types = list(fix_entry["metadata"].get("fix_types", []))
+        ref_fixes = fix_entry["metadata"].get("reference_fixes") or []
 
         for fix in ref_fixes:
             if fix.get("method") != fix.get("suggested_method"):
@@ -46,34 +210,74 @@ class FixHistoryLogger:
             if fix.get("class") not in file_path:
                 fix_types.append("broken_class_ref")
 
-        if "build_gradle_patch" in (metadata or {}):
+        if "build_gradle_patch" in fix_entry["metadata"]:
             fix_types.append("build_gradle_patch")
 
         if agent == "CompletionAgent":
             fix_types.append("gpt_completion")
 
         fix_entry["metadata"]["fix_types"] = sorted(set(fix_types))
+        self.store.append(fix_entry)
 
-        # Append to file history
-        history.append(fix_entry)
-
-        with open(log_path, "w", encoding="utf-8") as f:
-            json.dump(history, f, indent=2)
+    def history(self, file_path: str) -> List[dict]:
+        """
+        All logged entries for one file, oldest first.
+        """
+        rows = self.store.query(
+            "SELECT timestamp, agent, status, original_code, fixed_code, metadata FROM fixes WHERE file = ? ORDER BY id",
+            (file_path.replace("\\", "/"),)
+        )
+        return [
+            {"timestamp": t, "agent": a, "status": s, "original_code": o, "fixed_code": f, "metadata": json.loads(m)}
+            for t, a, s, o, f, m in rows
+        ]
 
-    def summarize_fix_types(self, file_path: str):
+    def summarize_fix_types(self, file_path: str = None):
         """
-        Returns a count of fix types for a given file.
+        Returns a count of fix types for a given file, or for the whole project if no file is given.
         """
-        log_path = os.path.join(self.log_dir, f"{file_path.replace('/', '__')}.json")
-        if not os.path.exists(log_path):
-            return {}
+        if file_path is None:
+            rows = self.store.query("SELECT fix_type, COUNT(*) FROM fix_types GROUP BY fix_type ORDER BY COUNT(*) DESC")
+        else:
+            rows = self.store.query(
+                "SELECT fix_type, COUNT(*) FROM fix_types WHERE file = ? GROUP BY fix_type ORDER BY COUNT(*) DESC",
+                (file_path.replace("\\", "/"),)
+            )
+        return dict(rows)
 
-        with open(log_path, "r", encoding="utf-8") as f:
-            history = json.load(f)
+    def agent_stats(self) -> Dict[str, dict]:
+        """
+        Per-agent totals and failure rate across the project.
+        """
+        rows = self.store.query(
+            "SELECT agent, COUNT(*), SUM(status != 'success') FROM fixes GROUP BY agent ORDER BY agent"
+        )
+        return {
+            agent: {"total": total, "failed": failed, "failure_rate": failed / total if total else 0.0}
+            for agent, total, failed in rows
+        }
 
-        summary = {}
-        for entry in history:
-            for fix in entry.get("metadata", {}).get("fix_types", []):
-                summary[fix] = summary.get(fix, 0) + 1
+    def worst_files(self, limit: int = 10) -> List[dict]:
+        """
+        Files with the most failed attempts (then the most attempts overall).
+        """
+        rows = self.store.query(
+            "SELECT file, COUNT(*) AS attempts, SUM(status != 'success') AS failures FROM fixes "
+            "GROUP BY file ORDER BY failures DESC, attempts DESC, file LIMIT ?",
+            (limit,)
+        )
+        return [
+            {"file": file, "attempts": attempts, "failures": failures, "failure_rate": failures / attempts}
+            for file, attempts, failures in rows
+        ]
 
-        return summary
+    def summary(self, limit: int = 5) -> dict:
+        total, failed = self.store.query("SELECT COUNT(*), COALESCE(SUM(status != 'success'), 0) FROM fixes")[0]
+        return {
+            "total": total,
+            "failed": failed,
+            "failure_rate": failed / total if total else 0.0,
+            "fix_types": self.summarize_fix_types(),
+            "agents": self.agent_stats(),
+            "worst_files": self.worst_files(limit)
+        }
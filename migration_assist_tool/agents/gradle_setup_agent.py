@@ -1,7 +1,9 @@
 import os
 import re
 import xml.etree.ElementTree as ET
-from agents.reference_promoter import ReferencePromoterAgent
+from agents.build_validator import WRAPPER_PLACEHOLDER
+from agents.reference_promoter import get_shared_promoter
+from utils.file_cache import read_text, write_text
 
 class GradleSetupAgent:
     def __init__(self, migrated_dir: str, legacy_dir: str, reference_dir: str = "", template_dir: str = "config/templates"):
@@ -10,10 +12,7 @@ class GradleSetupAgent:
         self.reference_dir = reference_dir
         self.template_dir = template_dir
 
-        self.promoter = None
-        if reference_dir:
-            self.promoter = ReferencePromoterAgent(reference_dir)
-            self.promoter.build_embedding_index()
+        self.promoter = get_shared_promoter(reference_dir) if reference_dir else None
 
     def setup(self):
         build_gradle = os.path.join(self.migrated_dir, "build.gradle")
@@ -105,8 +104,7 @@ class GradleSetupAgent:
 
     def _write_file(self, path: str, content: str):
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(content)
+        write_text(path, content)
 
     def _ensure_gradle_wrapper(self):
         gradlew = os.path.join(self.migrated_dir, "gradlew")
@@ -117,10 +115,10 @@ class GradleSetupAgent:
         os.makedirs(wrapper_dir, exist_ok=True)
 
         if not os.path.exists(gradlew):
-            self._write_file(gradlew, "#!/bin/bash\n# Gradle wrapper placeholder\n")
+            self._write_file(gradlew, f"#!/bin/bash\n# {WRAPPER_PLACEHOLDER}\n")
             os.chmod(gradlew, 0o755)
         if not os.path.exists(gradlew_bat):
-            self._write_file(gradlew_bat, "@echo off\nREM Gradle wrapper placeholder\n")
+            self._write_file(gradlew_bat, f"@echo off\nREM {WRAPPER_PLACEHOLDER}\n")
         if not os.path.exists(wrapper_props):
             self._write_file(wrapper_props, """\
 distributionBase=GRADLE_USER_HOME
@@ -168,8 +166,7 @@ dependencies {
             for file in files:
                 if file.endswith(".java"):
                     try:
-                        with open(os.path.join(root, file), "r", encoding="utf-8") as f:
-                            sample_code = f.read()
+                        sample_code = read_text(os.path.join(root, file))
                         if sample_code:
                             break
                     except Exception:
@@ -0,0 +1,404 @@
+# agents/incremental_compiler.py
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+from typing import Dict, List, Optional, Set
+from agents.build_diagnostics import make_diagnostic
+from agents.compile_service import get_compile_service
+from agents.java_parser import parse_java
+from agents.symbol_index import get_symbol_index
+from utils.file_cache import read_text
+from utils.tracing import span
+
+CACHE_VERSION = 1
+TYPE_REFERENCE = re.compile(r'\b([A-Z]\w*)\b')
+COMMENT_OR_STRING = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"', re.DOTALL)
+
+# Prints the main compile and annotation-processor classpaths of every Java project in the build
+CLASSPATH_INIT_SCRIPT = """
+allprojects {
+    plugins.withId('java') {
+        tasks.register('printMigrationClasspath') {
+            doLast {
+                println 'MIGRATION_CLASSPATH=' + project.sourceSets.main.compileClasspath.asPath
+                def processors = project.configurations.findByName('annotationProcessor')
+                println 'MIGRATION_PROCESSORPATH=' + (processors ? processors.asPath : '')
+            }
+        }
+    }
+}
+"""
+
+
+class IncrementalCompiler:
+    """
+    Compile checker for migrated files that knows the project around them.
+
+    - The Gradle compile classpath (and annotation-processor path) is resolved once and
+      cached against the content of the build scripts.
+    - Files compile with -sourcepath over the migrated source roots, so references to
+      other migrated classes resolve.
+    - A file-level dependency graph (type references matched against the symbol index)
+      decides what an edit invalidates: the edited file and the files that reference it.
+    - Verdicts are cached by fingerprint (file content, the content of every migrated file
+      it depends on transitively, classpath), so unchanged files are never compiled twice,
+      even across runs. The cached tree is revalidated by file stats on startup.
+    """
+
+    def __init__(self, migrated_dir: str, cache_path: Optional[str] = None, gradle_timeout: float = 600.0):
+        self.migrated_dir = migrated_dir
+        if cache_path is None:
+            digest = hashlib.md5(os.path.abspath(migrated_dir).encode("utf-8")).hexdigest()[:10]
+            cache_path = os.path.join("data", f"compile_cache_{digest}.json")
+        self.cache_path = cache_path
+        self.gradle_timeout = gradle_timeout
+
+        self.compiler = get_compile_service()
+        self.symbols = get_symbol_index(migrated_dir)
+        self.stats = {"cached": 0, "compiled": 0}
+
+        self._lock = threading.RLock()
+        self._files: Dict[str, dict] = {}       # rel path -> {size, mtime_ns, hash, refs}
+        self._verdicts: Dict[str, dict] = {}    # rel path -> {fingerprint, success, diagnostics}
+        self._classpath: Optional[dict] = None  # {build_hash, classpath, processorpath}
+        self._dirty = False
+        self._tree_checked = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("version") == CACHE_VERSION:
+                self._files = cached.get("files", {})
+                self._verdicts = cached.get("verdicts", {})
+                self._classpath = cached.get("classpath")
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable compile cache {self.cache_path}: {e}")
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            directory = os.path.dirname(self.cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": CACHE_VERSION,
+                    "classpath": self._classpath,
+                    "files": self._files,
+                    "verdicts": self._verdicts
+                }, f, separators=(",", ":"))
+            os.replace(tmp_path, self.cache_path)
+            self._dirty = False
+
+    # ── Classpath ───────────────────────────────────────────────────────────
+
+    def _build_hash(self) -> str:
+        digest = hashlib.sha256()
+        for name in ("build.gradle", "build.gradle.kts", "settings.gradle", "settings.gradle.kts", "gradle.properties"):
+            path = os.path.join(self.migrated_dir, name)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    digest.update(name.encode("utf-8") + b"\0" + f.read())
+        return digest.hexdigest()
+
+    def _gradle_command(self) -> Optional[str]:
+        wrapper = os.path.join(self.migrated_dir, "gradlew.bat" if os.name == "nt" else "gradlew")
+        if os.path.exists(wrapper):
+            return os.path.abspath(wrapper)
+        return shutil.which("gradle")
+
+    def _resolve_classpath(self) -> dict:
+        build_hash = self._build_hash()
+        if self._classpath and self._classpath.get("build_hash") == build_hash:
+            return self._classpath
+
+        resolved = {"build_hash": build_hash, "classpath": "", "processorpath": ""}
+        gradle = self._gradle_command()
+        if gradle is None:
+            print("⚠️ No Gradle found; compile checks run without the dependency classpath")
+        else:
+            print("📚 Resolving Gradle compile classpath (cached until the build scripts change)...")
+            with tempfile.NamedTemporaryFile("w", suffix=".gradle", delete=False, encoding="utf-8") as script:
+                script.write(CLASSPATH_INIT_SCRIPT)
+            try:
+                result = subprocess.run(
+                    [gradle, "-q", "--init-script", script.name, "printMigrationClasspath"],
+                    cwd=self.migrated_dir,
+                    capture_output=True,
+                    text=True,
+                    timeout=self.gradle_timeout
+                )
+                classpath, processorpath = [], []
+                for line in result.stdout.splitlines():
+                    if line.startswith("MIGRATION_CLASSPATH="):
+                        classpath.extend(p for p in line.split("=", 1)[1].split(os.pathsep) if p)
+                    elif line.startswith("MIGRATION_PROCESSORPATH="):
+                        processorpath.extend(p for p in line.split("=", 1)[1].split(os.pathsep) if p)
+                if result.returncode != 0:
+                    print(f"⚠️ Classpath resolution failed: {result.stderr.strip()[-500:]}")
+                resolved["classpath"] = os.pathsep.join(dict.fromkeys(classpath))
+                resolved["processorpath"] = os.pathsep.join(dict.fromkeys(processorpath))
+            except (OSError, subprocess.TimeoutExpired) as e:
+                print(f"⚠️ Classpath resolution failed: {e}")
+            finally:
+                os.unlink(script.name)
+
+        self._classpath = resolved
+        self._dirty = True
+        return resolved
+
+    # ── Source tree and dependency graph ────────────────────────────────────
+
+    def _source_roots(self) -> List[str]:
+        # A file's source root is its directory minus the package path it declares
+        roots = set()
+        for rel_path, record in self._files.items():
+            directory = os.path.dirname(os.path.join(self.migrated_dir, rel_path))
+            package_dir = record.get("package", "").replace(".", os.sep)
+            if package_dir and directory.endswith(package_dir):
+                directory = directory[:-len(package_dir)].rstrip(os.sep)
+            roots.add(os.path.abspath(directory))
+        return sorted(roots)
+
+    def _refresh_file(self, rel_path: str) -> Optional[dict]:
+        full_path = os.path.join(self.migrated_dir, rel_path)
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            self._files.pop(rel_path, None)
+            return None
+
+        record = self._files.get(rel_path)
+        if record and record["size"] == stat.st_size and record["mtime_ns"] == stat.st_mtime_ns:
+            return record
+
+        code = read_text(full_path, errors="replace")
+        record = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": hashlib.sha256(code.encode("utf-8")).hexdigest(),
+            "package": parse_java(code)["package"],
+            "refs": sorted(set(TYPE_REFERENCE.findall(COMMENT_OR_STRING.sub(" ", code))))
+        }
+        self._files[rel_path] = record
+        self._dirty = True
+        return record
+
+    def _ensure_tree(self):
+        # Records loaded from the cache are revalidated against the tree once per process:
+        # unchanged files are kept by (size, mtime_ns), new files are added, deleted ones dropped
+        if not self._tree_checked:
+            self._scan_tree()
+            self._tree_checked = True
+
+    def _scan_tree(self):
+        seen = set()
+        stack = [self.migrated_dir]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not entry.name.startswith(".") and entry.name not in ("build", ".gradle"):
+                                stack.append(entry.path)
+                        elif entry.name.endswith(".java"):
+                            rel_path = os.path.relpath(entry.path, self.migrated_dir)
+                            seen.add(rel_path)
+                            self._refresh_file(rel_path)
+            except OSError as e:
+                print(f"⚠️ Cannot scan {directory}: {e}")
+        for rel_path in set(self._files) - seen:
+            del self._files[rel_path]
+            self._verdicts.pop(rel_path, None)
+            self._dirty = True
+
+    def dependencies(self, rel_path: str) -> Set[str]:
+        """
+        Migrated files that `rel_path` references by type name.
+        """
+        record = self._files.get(rel_path)
+        if not record:
+            return set()
+        deps = set()
+        for name in record["refs"]:
+            for entry in self.symbols.classes.get(name, []):
+                if entry["path"] != rel_path:
+                    deps.add(entry["path"])
+        return deps
+
+    def dependents(self, rel_paths: List[str]) -> Set[str]:
+        """
+        Files that directly reference any of `rel_paths`; these are the files an edit can break.
+        """
+        with self._lock:
+            self.symbols._ensure_built()
+            self._ensure_tree()
+            names = set()
+            for rel_path in rel_paths:
+                entry = self.symbols.files.get(rel_path)
+                names.update(cls["name"] for cls in (entry or {}).get("classes", []))
+            return {
+                path for path, record in self._files.items()
+                if path not in rel_paths and names.intersection(record["refs"])
+            }
+
+    def _fingerprint(self, rel_path: str, classpath: dict, closures: Optional[Dict[str, Set[str]]] = None) -> str:
+        """
+        Hash of the file, the classpath and every migrated file it depends on, directly or
+        transitively, so a change anywhere below it invalidates its verdict.
+        `closures` memoizes dependency lookups across the files of one check.
+        """
+        closures = {} if closures is None else closures
+        seen, stack = {rel_path}, [rel_path]
+        while stack:
+            current = stack.pop()
+            if current not in closures:
+                closures[current] = self.dependencies(current)
+            for dep in closures[current]:
+                if dep not in seen and self._refresh_file(dep):
+                    seen.add(dep)
+                    stack.append(dep)
+
+        digest = hashlib.sha256()
+        digest.update(classpath["build_hash"].encode("utf-8"))
+        digest.update(self._files[rel_path]["hash"].encode("utf-8"))
+        for dep in sorted(seen - {rel_path}):
+            digest.update(dep.encode("utf-8") + self._files[dep]["hash"].encode("utf-8"))
+        return digest.hexdigest()
+
+    # ── Checking ────────────────────────────────────────────────────────────
+
+    def _rel(self, path: str) -> str:
+        if os.path.isabs(path) or not os.path.exists(os.path.join(self.migrated_dir, path)):
+            return os.path.relpath(os.path.abspath(path), os.path.abspath(self.migrated_dir))
+        return os.path.normpath(path)
+
+    def check(self, paths: List[str], output_dir: str = os.path.join(".buildcheck", "bin")) -> Dict[str, dict]:
+        """
+        Returns {rel_path: {"success", "diagnostics", "cached"}} for `paths` (relative to
+        migrated_dir or absolute). Only files whose fingerprint changed are compiled, and
+        those are compiled together in one request (see _compile for failing batches).
+        """
+        with span("compile.check", files=len(paths)) as attrs:
+            results = self._check(paths, output_dir)
+            attrs.update(
+                cache_hits=sum(1 for r in results.values() if r["cached"]),
+                failed=sum(1 for r in results.values() if not r["success"])
+            )
+            return results
+
+    def _check(self, paths: List[str], output_dir: str) -> Dict[str, dict]:
+        with self._lock:
+            self.symbols._ensure_built()
+            self._ensure_tree()
+            classpath = self._resolve_classpath()
+
+            results, pending, closures = {}, {}, {}
+            for path in paths:
+                rel_path = self._rel(path)
+                if self._refresh_file(rel_path) is None:
+                    results[rel_path] = {"success": False, "cached": False, "diagnostics": [
+                        dict(make_diagnostic("ERROR", rel_path, 0, 0, "file not found"), code="")
+                    ]}
+                    continue
+                fingerprint = self._fingerprint(rel_path, classpath, closures)
+                verdict = self._verdicts.get(rel_path)
+                if verdict and verdict["fingerprint"] == fingerprint:
+                    self.stats["cached"] += 1
+                    results[rel_path] = {"success": verdict["success"], "diagnostics": verdict["diagnostics"], "cached": True}
+                else:
+                    pending[rel_path] = fingerprint
+            source_roots = self._source_roots()
+
+        if pending:
+            os.makedirs(output_dir, exist_ok=True)
+            # Report every error: javac stops at 100 by default, leaving later files looking clean
+            options = [
+                "-d", output_dir, "-implicit:none", "-encoding", "UTF-8", "-Xmaxerrs", "100000", "-Xmaxwarns", "100000",
+                "-sourcepath", os.pathsep.join(source_roots)
+            ]
+            if classpath["classpath"]:
+                options += ["-classpath", classpath["classpath"]]
+            if classpath["processorpath"]:
+                options += ["-processorpath", classpath["processorpath"]]
+            outcome = self._compile(list(pending), options)
+
+            with self._lock:
+                for rel_path, fingerprint in pending.items():
+                    success, diagnostics, trusted = outcome[rel_path]
+                    results[rel_path] = {"success": success, "diagnostics": diagnostics, "cached": False}
+                    if trusted:
+                        self._verdicts[rel_path] = {"fingerprint": fingerprint, "success": success, "diagnostics": diagnostics}
+                        self._dirty = True
+        return results
+
+    def _compile(self, rel_paths: List[str], options: List[str]) -> Dict[str, tuple]:
+        """
+        Compiles `rel_paths` together; returns {rel_path: (success, diagnostics, trusted)}.
+        Only trusted verdicts may be cached. A file is trusted as compiling only when a
+        compile containing it succeeded: javac may stop (e.g. after parse errors) before
+        reporting other files, so the clean files of a failed batch are recompiled without
+        the failing ones, halving the batch until it passes or the file stands alone.
+        """
+        compiled = self.compiler.compile([os.path.join(self.migrated_dir, rel_path) for rel_path in rel_paths], options)
+        self.stats["compiled"] += len(rel_paths)
+
+        by_file = {}
+        for diagnostic in compiled["diagnostics"]:
+            if diagnostic["file"]:
+                by_file.setdefault(self._rel(diagnostic["file"]), []).append(diagnostic)
+        errors = [d for d in compiled["diagnostics"] if d["kind"] == "ERROR"]
+        unattributed = [d for d in errors if not d["file"]]
+        if not compiled["success"] and not errors:
+            unattributed = [dict(make_diagnostic("ERROR", "", 0, 0, "compilation failed without reporting an error"), code="")]
+        # Failures without a file (bad options, crashed compiler) say nothing about the files themselves
+        if unattributed:
+            return {rel_path: (False, by_file.get(rel_path, []) + unattributed, False) for rel_path in rel_paths}
+
+        outcome, clean = {}, []
+        for rel_path in rel_paths:
+            diagnostics = by_file.get(rel_path, [])
+            if any(d["kind"] == "ERROR" for d in diagnostics):
+                outcome[rel_path] = (False, diagnostics, True)
+            elif compiled["success"]:
+                outcome[rel_path] = (True, diagnostics, True)
+            else:
+                clean.append(rel_path)
+
+        if len(clean) < len(rel_paths) and clean:
+            outcome.update(self._compile(clean, options))
+        elif len(clean) > 1:
+            half = len(clean) // 2
+            outcome.update(self._compile(clean[:half], options))
+            outcome.update(self._compile(clean[half:], options))
+        elif clean:
+            # Fails alone, but only on errors in other files (a broken dependency on the sourcepath)
+            outcome[clean[0]] = (False, by_file.get(clean[0], []) + errors, False)
+        return outcome
+
+    def check_file(self, path: str, output_dir: str = os.path.join(".buildcheck", "bin")) -> bool:
+        return next(iter(self.check([path], output_dir).values()))["success"]
+
+    def invalidate(self, rel_paths: List[str]):
+        """
+        Forgets verdicts for edited files and their dependents so the next check recompiles them.
+        Fingerprints already catch content changes; this is for edits made outside the checker's view.
+        """
+        with self._lock:
+            for rel_path in set(rel_paths) | self.dependents(rel_paths):
+                self._verdicts.pop(rel_path, None)
+            self._dirty = True
@@ -0,0 +1,328 @@
+# agents/java_parser.py
+
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+TYPE_KEYWORD = re.compile(r'\b(class|interface|enum|record)\s+(\w+)')
+ANNOTATION = re.compile(r'@(?!interface\b)([\w.]+)(\s*\([^()]*\))?')
+COMMENT = re.compile(r'//[^\n]*|/\*.*?\*/', re.DOTALL)
+IDENTIFIER = re.compile(r'(\w+)\s*$')
+MODIFIERS = {
+    "public", "protected", "private", "static", "final", "abstract", "synchronized",
+    "native", "transient", "volatile", "strictfp", "default", "sealed", "non-sealed"
+}
+
+_CACHE_SIZE = 512
+_cache: OrderedDict = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _skip_literal(code: str, i: int) -> int:
+    """
+    If a comment, string, text block or char literal starts at i, returns the index just past it; otherwise i.
+    """
+    if code.startswith("//", i):
+        end = code.find("\n", i)
+        return len(code) if end == -1 else end
+    if code.startswith("/*", i):
+        end = code.find("*/", i + 2)
+        return len(code) if end == -1 else end + 2
+    if code.startswith('"""', i):
+        end = code.find('"""', i + 3)
+        return len(code) if end == -1 else end + 3
+    quote = code[i]
+    if quote == '"' or quote == "'":
+        i += 1
+        while i < len(code) and code[i] != quote and code[i] != "\n":
+            i += 2 if code[i] == "\\" else 1
+        return i + 1
+    return i
+
+
+def _clean_header(text: str):
+    """
+    Strips comments and annotations from a declaration header.
+    Returns (declaration with collapsed whitespace, simple annotation names).
+    """
+    text = COMMENT.sub(" ", text)
+    annotations = [m.group(1).split(".")[-1] for m in ANNOTATION.finditer(text)]
+    text = ANNOTATION.sub(" ", text)
+    return " ".join(text.split()), annotations
+
+
+def _split_top_level(text: str) -> list:
+    parts, current, depth = [], [], 0
+    for c in text:
+        if c in "<([{":
+            depth += 1
+        elif c in ">)]}":
+            depth -= 1
+        if c == "," and depth == 0:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(c)
+    parts.append("".join(current))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _strip_type_parameters(text: str) -> str:
+    # Drops a leading generic type parameter list such as `<K, V extends Foo<K>>`
+    if not text.startswith("<"):
+        return text
+    depth = 0
+    for idx, c in enumerate(text):
+        if c == "<":
+            depth += 1
+        elif c == ">":
+            depth -= 1
+            if depth == 0:
+                return text[idx + 1:].strip()
+    return text
+
+
+def _leading_modifiers(words: list) -> tuple:
+    modifiers = []
+    while words and words[0] in MODIFIERS:
+        modifiers.append(words.pop(0))
+    return modifiers, words
+
+
+def _is_method_header(decl: str) -> bool:
+    paren = decl.find("(")
+    return paren != -1 and "=" not in decl[:paren]
+
+
+def _parse_method(decl: str) -> dict:
+    paren = decl.find("(")
+    name_match = IDENTIFIER.search(decl[:paren])
+    if not name_match:
+        return None
+
+    depth, close = 0, len(decl)
+    for idx in range(paren, len(decl)):
+        if decl[idx] == "(":
+            depth += 1
+        elif decl[idx] == ")":
+            depth -= 1
+            if depth == 0:
+                close = idx
+                break
+    params = _split_top_level(decl[paren + 1:close])
+    param_types = [" ".join(w for w in p.split()[:-1] if w != "final") for p in params]
+
+    modifiers, rest = _leading_modifiers(decl[:name_match.start()].split())
+    return {
+        "name": name_match.group(1),
+        "modifiers": modifiers,
+        "return_type": _strip_type_parameters(" ".join(rest)),
+        "params": params,
+        "param_types": param_types,
+        "arity": len(params),
+        "signature": decl,
+    }
+
+
+def _parse_fields(decl: str) -> list:
+    declarators = _split_top_level(decl)
+    if not declarators:
+        return []
+    modifiers, words = _leading_modifiers(declarators[0].split("=", 1)[0].split())
+    if len(words) < 2:
+        return []
+    field_type = " ".join(words[:-1])
+    names = [words[-1]] + [d.split("=", 1)[0].strip() for d in declarators[1:]]
+    return [{"name": n, "type": field_type, "modifiers": modifiers} for n in names if re.fullmatch(r'\w+', n)]
+
+
+def _scan(code: str) -> dict:
+    result = {"package": "", "package_span": None, "imports": [], "types": [], "fields": [], "methods": [], "initializers": []}
+
+    depth = 0
+    open_types = []     # stack of (type index, body depth, enum constants still open)
+    method = None       # method whose body is open, with the depth of that body
+    skipped = None      # initializer, enum-constant or field-initializer body: {"depth", "keep", "initializer"}
+    stmt_start = None   # first char of the pending declaration, including leading comments
+    decl_start = None   # first char of the pending declaration after its leading comments
+    parens = 0          # open '(' in the pending declaration; a '{' inside one (e.g. @A({"x"})) stays in the header
+
+    i, n = 0, len(code)
+    while i < n:
+        c = code[i]
+        if c.isspace():
+            i += 1
+            continue
+
+        in_type_body = bool(open_types) and depth == open_types[-1][1] and method is None and skipped is None
+        in_declaration_scope = in_type_body or depth == 0
+
+        end = _skip_literal(code, i)
+        if end != i:
+            if in_declaration_scope:
+                if stmt_start is None:
+                    stmt_start = i
+                if decl_start is None and code[i] != "/":
+                    decl_start = i
+            i = end
+            continue
+
+        if in_declaration_scope and decl_start is None and c not in "{};":
+            decl_start = i
+            if stmt_start is None:
+                stmt_start = i
+
+        if c == "{":
+            if in_declaration_scope and parens > 0:
+                # Array value of an annotation, or a lambda/anonymous class in an argument list
+                skipped = {"depth": depth + 1, "keep": True, "initializer": None}
+            elif in_declaration_scope and decl_start is not None:
+                decl, annotations = _clean_header(code[decl_start:i])
+                type_match = TYPE_KEYWORD.search(decl)
+                owner = open_types[-1] if open_types else None
+                owner_name = result["types"][owner[0]]["name"] if owner else ""
+                if type_match and not re.search(r'[(=]', decl[:type_match.start()]):
+                    result["types"].append({
+                        "kind": type_match.group(1),
+                        "name": type_match.group(2),
+                        "owner": owner_name,
+                        "parent": owner[0] if owner else None,
+                        "annotations": annotations,
+                        "header": decl,
+                        "start": stmt_start,
+                        "decl_start": decl_start,
+                        "body_start": i + 1,
+                        "end": n,
+                    })
+                    open_types.append((len(result["types"]) - 1, depth + 1, type_match.group(1) == "enum"))
+                    stmt_start = decl_start = None
+                    parens = 0
+                elif owner and owner[2]:
+                    # Enum constant with its own class body; the constant list continues after it
+                    skipped = {"depth": depth + 1, "keep": True, "initializer": None}
+                elif owner and _is_method_header(decl) and _parse_method(decl):
+                    method = {
+                        **_parse_method(decl),
+                        "owner": owner_name,
+                        "type_index": owner[0],
+                        "annotations": annotations,
+                        "start": stmt_start,
+                        "decl_start": decl_start,
+                        "body_start": i + 1,
+                        "depth": depth + 1,
+                    }
+                else:
+                    # Array initializer, anonymous class or lambda inside a field declaration
+                    # (which continues to its ';'), or an unrecognised block
+                    skipped = {"depth": depth + 1, "keep": "=" in decl, "initializer": None}
+                    if not skipped["keep"] and owner and decl in ("", "static"):
+                        skipped["initializer"] = {"owner": owner_name, "type_index": owner[0], "static": bool(decl), "start": stmt_start}
+            elif in_type_body:
+                # Instance initializer block
+                owner = open_types[-1]
+                skipped = {"depth": depth + 1, "keep": False, "initializer": {
+                    "owner": result["types"][owner[0]]["name"], "type_index": owner[0], "static": False, "start": i
+                }}
+            depth += 1
+
+        elif c == "}":
+            if method is not None and depth == method["depth"]:
+                method.pop("depth")
+                method["end"] = i + 1
+                result["methods"].append(method)
+                method = None
+                stmt_start = decl_start = None
+                parens = 0
+            elif skipped is not None and depth == skipped["depth"]:
+                if skipped["initializer"]:
+                    result["initializers"].append({**skipped["initializer"], "end": i + 1})
+                if not skipped["keep"]:
+                    stmt_start = decl_start = None
+                    parens = 0
+                skipped = None
+            elif method is None and skipped is None and open_types and depth == open_types[-1][1]:
+                result["types"][open_types.pop()[0]]["end"] = i + 1
+                stmt_start = decl_start = None
+                parens = 0
+            depth = max(depth - 1, 0)
+
+        elif c == "(" and in_declaration_scope:
+            parens += 1
+
+        elif c == ")" and in_declaration_scope:
+            parens = max(parens - 1, 0)
+
+        elif c == ";" and in_declaration_scope:
+            if depth == 0 and decl_start is not None:
+                decl, _ = _clean_header(code[decl_start:i])
+                if decl.startswith("package "):
+                    result["package"] = decl[len("package "):].strip()
+                    result["package_span"] = (decl_start, i + 1)
+                elif decl.startswith("import "):
+                    name = decl[len("import "):].strip()
+                    is_static = name.startswith("static ")
+                    result["imports"].append({
+                        "text": code[decl_start:i + 1],
+                        "name": name[len("static "):].strip() if is_static else name,
+                        "static": is_static,
+                        "start": decl_start,
+                        "end": i + 1,
+                    })
+            elif depth > 0:
+                index, body_depth, constants_open = open_types[-1]
+                owner_name = result["types"][index]["name"]
+                if constants_open:
+                    open_types[-1] = (index, body_depth, False)
+                elif decl_start is not None:
+                    decl, annotations = _clean_header(code[decl_start:i])
+                    span = {"owner": owner_name, "type_index": index, "annotations": annotations,
+                            "start": stmt_start, "decl_start": decl_start, "end": i + 1}
+                    if _is_method_header(decl):
+                        parsed = _parse_method(decl)
+                        if parsed:
+                            result["methods"].append({**parsed, **span, "body_start": None})
+                    else:
+                        result["fields"].extend({**field, **span} for field in _parse_fields(decl))
+            stmt_start = decl_start = None
+            parens = 0
+        i += 1
+
+    result["methods"].sort(key=lambda m: m["start"])
+    return result
+
+
+def content_hash(code: str) -> str:
+    return hashlib.md5(code.encode("utf-8")).hexdigest()
+
+
+def parse_java(code: str) -> dict:
+    """
+    Structural scan of Java source in a single linear pass, memoized by content hash.
+
+    Returns a dict with:
+      package, package_span  - declared package and its (start, end) offsets, or "" / None
+      imports                - [{text, name, static, start, end}]
+      types                  - [{kind, name, owner, parent, annotations, header, start, decl_start, body_start, end}]
+      fields                 - [{name, type, modifiers, owner, type_index, annotations, start, decl_start, end}]
+      methods                - [{name, modifiers, return_type, params, param_types, arity, signature,
+                                 owner, type_index, annotations, start, decl_start, body_start, end}]
+      initializers           - [{owner, type_index, static, start, end}]
+
+    Offsets index into `code`. `start` includes leading comments and Javadoc, `decl_start` does not;
+    `body_start` is None for methods without a body. Only members declared directly in a type body
+    are reported, so locals and anonymous classes are skipped. The result is shared between callers
+    and must not be mutated.
+    """
+    key = content_hash(code)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    parsed = _scan(code)
+    with _cache_lock:
+        _cache[key] = parsed
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return parsed
@@ -0,0 +1,195 @@
+# agents/method_resolver.py
+
+import re
+import json
+import hashlib
+import difflib
+import threading
+from contextlib import nullcontext
+from collections import OrderedDict
+from typing import List, Optional
+
+CAMEL_BOUNDARY = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+
+# Verbs that legacy and migrated code commonly use interchangeably
+SYNONYMS = [
+    {"get", "find", "fetch", "load", "retrieve", "read", "lookup", "query", "select"},
+    {"save", "store", "persist", "insert", "create", "add", "put", "register"},
+    {"update", "modify", "edit", "change", "set"},
+    {"delete", "remove", "drop", "erase", "purge"},
+    {"list", "all", "many", "search"},
+    {"count", "size", "total"},
+    {"exists", "has", "contains", "is"},
+]
+_SYNONYM_OF = {word: frozenset(group) for group in SYNONYMS for word in group}
+
+_MEMO_SIZE = 4096
+_memo: OrderedDict = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def identifier_tokens(name: str) -> List[str]:
+    """
+    Splits camelCase, PascalCase and snake_case identifiers into lowercase words.
+    """
+    return [t.lower() for part in name.split("_") for t in CAMEL_BOUNDARY.findall(part)]
+
+
+def call_arity(code: str, open_paren: int) -> Optional[int]:
+    """
+    Counts the top-level arguments of the call whose '(' is at open_paren; None if unbalanced.
+    """
+    depth = 0
+    args = 0
+    has_content = False
+    i = open_paren
+    while i < len(code):
+        c = code[i]
+        if c in "\"'":
+            # Skip string and char literals so their commas and parens are ignored
+            i += 1
+            while i < len(code) and code[i] != c:
+                i += 2 if code[i] == "\\" else 1
+        elif c in "([{":
+            depth += 1
+        elif c in ")]}":
+            depth -= 1
+            if depth == 0:
+                return args + 1 if has_content else 0
+        elif c == "," and depth == 1:
+            args += 1
+        if depth >= 1 and i > open_paren and not c.isspace():
+            has_content = True
+        i += 1
+    return None
+
+
+def _token_similarity(a: List[str], b: List[str]) -> float:
+    if not a or not b:
+        return 0.0
+    matched = 0.0
+    remaining = list(b)
+    for token in a:
+        if token in remaining:
+            remaining.remove(token)
+            matched += 1.0
+            continue
+        synonyms = _SYNONYM_OF.get(token)
+        partner = next((t for t in remaining if synonyms and t in synonyms), None)
+        if partner:
+            remaining.remove(partner)
+            matched += 0.8
+    return 2 * matched / (len(a) + len(b))
+
+
+class MethodResolver:
+    """
+    Maps a call to a method that does not exist onto the most likely method of the target class.
+
+    Candidates are ranked locally by identifier-word overlap (with common verb synonyms),
+    edit distance and arity against the call site. The LLM is asked, with method signatures
+    only, when the best local score is low or too close to the runner-up. Answers are
+    memoized per (class signature hash, missing name, arity) for the whole process.
+    """
+
+    def __init__(self, llm=None, min_score: float = 0.6, min_margin: float = 0.08, llm_slots=None):
+        self.llm = llm
+        self.llm_slots = llm_slots or nullcontext()
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.stats = {"local": 0, "llm": 0, "memo": 0, "unresolved": 0}
+
+    def score(self, missing: str, candidate: dict, arity: Optional[int] = None) -> float:
+        token_score = _token_similarity(identifier_tokens(missing), identifier_tokens(candidate["name"]))
+        edit_score = difflib.SequenceMatcher(None, missing.lower(), candidate["name"].lower()).ratio()
+        if arity is None:
+            arity_score = 0.5
+        else:
+            arity_score = 1.0 if len(candidate.get("params", [])) == arity else 0.0
+        return 0.5 * token_score + 0.3 * edit_score + 0.2 * arity_score
+
+    def rank(self, missing: str, candidates: List[dict], arity: Optional[int] = None) -> List[tuple]:
+        """
+        Returns [(score, name)] best first, keeping the best-scoring overload of each name.
+        """
+        best = {}
+        for candidate in candidates:
+            value = self.score(missing, candidate, arity)
+            if value > best.get(candidate["name"], -1.0):
+                best[candidate["name"]] = value
+        return sorted(((value, name) for name, value in best.items()), key=lambda item: (-item[0], item[1]))
+
+    def resolve(self, class_name: str, missing: str, candidates: List[dict], arity: Optional[int] = None) -> Optional[str]:
+        """
+        `candidates` are dicts with name, params and (optionally) returns, e.g. the
+        "signatures" entries of the symbol index. Returns a method name or None.
+        """
+        candidates = [c for c in candidates if c["name"] != missing]
+        if not candidates:
+            return None
+
+        class_hash = hashlib.sha256(json.dumps([class_name, candidates], sort_keys=True).encode("utf-8")).hexdigest()
+        key = (class_hash, missing, arity)
+        with _memo_lock:
+            if key in _memo:
+                _memo.move_to_end(key)
+                self.stats["memo"] += 1
+                return _memo[key]
+
+        ranked = self.rank(missing, candidates, arity)
+        top_score, top_name = ranked[0]
+        runner_up = ranked[1][0] if len(ranked) > 1 else 0.0
+
+        if top_score >= self.min_score and top_score - runner_up >= self.min_margin:
+            answer = top_name
+            self.stats["local"] += 1
+        else:
+            answer, final = self._ask_llm(class_name, missing, candidates, arity, ranked)
+            if not final:
+                # Do not memoize transient LLM failures
+                return answer
+
+        with _memo_lock:
+            _memo[key] = answer
+            if len(_memo) > _MEMO_SIZE:
+                _memo.popitem(last=False)
+        return answer
+
+    def _ask_llm(self, class_name: str, missing: str, candidates: List[dict], arity: Optional[int], ranked: List[tuple], limit: int = 40) -> tuple:
+        """
+        Returns (method name or None, whether the answer may be memoized).
+        """
+        if self.llm is None:
+            self.stats["unresolved"] += 1
+            return None, True
+
+        # Offer signatures only, best local matches first
+        order = {name: position for position, (_, name) in enumerate(ranked[:limit])}
+        shortlist = sorted((c for c in candidates if c["name"] in order), key=lambda c: order[c["name"]])
+        signatures = "\n".join(
+            f"{c.get('returns', '')} {c['name']}({', '.join(c.get('params', []))})".strip()
+            for c in shortlist
+        )
+        call = f"{missing}(...)" if arity is None else f"{missing} with {arity} argument(s)"
+        prompt = f"""Class {class_name} has these methods:
+
+{signatures}
+
+Which one is the most semantically similar to the missing method {call}?
+Only return the method name. No explanation."""
+        try:
+            with self.llm_slots:
+                response = self.llm.complete([
+                    {"role": "user", "content": prompt}
+                ])
+            answer = response.strip().split("(")[0].strip()
+        except Exception as e:
+            print(f"⚠️ Method resolution for {class_name}.{missing} failed: {e}")
+            return None, False
+
+        self.stats["llm"] += 1
+        if answer in order:
+            return answer, True
+        # Never rewrite a call to a name the class does not declare
+        print(f"⚠️ Ignoring suggestion '{answer}' for {class_name}.{missing}: not a method of the class")
+        return None, True
@@ -1,18 +1,26 @@
 # agents/migrated_file_stitcher.py
 
 import os
-import re
 from typing import List, Dict
+from agents.java_parser import parse_java
+from agents.symbol_index import get_symbol_index
+from utils.file_cache import read_text, write_text
 
 class MigratedFileStitcherAgent:
     def __init__(self, migrated_dir: str):
         self.migrated_dir = migrated_dir
+        self.symbols = get_symbol_index(migrated_dir)
 
     def stitch_files(self, target_path: str, fragment_paths: List[str]) -> dict:
-        stitched_code = ""
-        method_signatures = set()
+        package_line = ""
+        imports = []
+        class_header = ""
+        fields = []
+        methods = []
         seen_imports = set()
-        class_declared = False
+        seen_fields = set()
+        method_signatures = set()
+        seen_types = set()
 
         stitched_path = os.path.join(self.migrated_dir, target_path)
         fragments = []
@@ -22,43 +30,60 @@ class MigratedFileStitcherAgent:
             if not os.path.exists(full_path):
                 continue
 
-            with open(full_path, "r", encoding="utf-8") as f:
-                code = f.read()
+            code = read_text(full_path)
+            parsed = parse_java(code)
+
+            if parsed["package_span"] and not package_line:
+                start, end = parsed["package_span"]
+                package_line = code[start:end]
 
             # Extract imports and deduplicate
-            imports = re.findall(r'^import\s+[\w\.]+;', code, re.MULTILINE)
-            for imp in imports:
-                if imp not in seen_imports:
-                    stitched_code += imp + "\n"
-                    seen_imports.add(imp)
+            for imp in parsed["imports"]:
+                if imp["text"] not in seen_imports:
+                    imports.append(imp["text"])
+                    seen_imports.add(imp["text"])
 
-            # Extract class body
-            match = re.search(r'(public|class).*?class\s+(\w+)\s*{', code, re.DOTALL)
-            if match and not class_declared:
-                class_declared = True
-                header = code[:match.end()]
-                stitched_code += "\n\n" + header + "\n"
-            elif class_declared:
-                code = re.sub(r'(public|class).*?class\s+\w+\s*{', '', code, flags=re.DOTALL)
+            # The first fragment's top-level type supplies the class declaration
+            top_level = [i for i, t in enumerate(parsed["types"]) if t["parent"] is None]
+            if top_level:
+                index = top_level[0]
+                if not class_header:
+                    decl = parsed["types"][index]
+                    class_header = code[decl["start"]:decl["body_start"]]
 
-            # Extract and deduplicate methods
-            methods = re.findall(r'(public|private|protected|static|\s)+[\w<>\[\]]+\s+\w+\s*\([^)]*\)\s*{(?:[^{}]*|{[^{}]*})*}', code, re.DOTALL)
-            for method in methods:
-                signature = re.findall(r'\s+(\w+)\s*\(', method)
-                if signature:
-                    method_name = signature[0]
-                    if method_name not in method_signatures:
-                        stitched_code += "\n\n" + method.strip()
-                        method_signatures.add(method_name)
+                # Extract and deduplicate fields, methods (overloads are kept) and nested types
+                for field in parsed["fields"]:
+                    if field["type_index"] == index and field["name"] not in seen_fields:
+                        fields.append(code[field["start"]:field["end"]].strip())
+                        seen_fields.add(field["name"])
+                for method in parsed["methods"]:
+                    signature = (method["name"], tuple(method["param_types"]))
+                    if method["type_index"] == index and signature not in method_signatures:
+                        methods.append(code[method["start"]:method["end"]].strip())
+                        method_signatures.add(signature)
+                for nested in parsed["types"]:
+                    if nested["parent"] == index and nested["name"] not in seen_types:
+                        methods.append(code[nested["start"]:nested["end"]].strip())
+                        seen_types.add(nested["name"])
 
             fragments.append(frag_path)
 
+        stitched_code = ""
+        if package_line:
+            stitched_code += package_line + "\n\n"
+        stitched_code += "".join(imp + "\n" for imp in imports)
+        if class_header:
+            stitched_code += "\n\n" + class_header + "\n"
+        for field in fields:
+            stitched_code += "\n    " + field
+        for method in methods:
+            stitched_code += "\n\n    " + method
         stitched_code += "\n\n}"
 
         # Write final stitched file
         os.makedirs(os.path.dirname(stitched_path), exist_ok=True)
-        with open(stitched_path, "w", encoding="utf-8") as f:
-            f.write(stitched_code)
+        write_text(stitched_path, stitched_code)
+        self.symbols.update_file(target_path)
 
         return {
             "status": "stitched",
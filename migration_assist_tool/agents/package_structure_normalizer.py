@@ -1,23 +1,27 @@
 # agents/package_structure_normalizer.py
 
 import os
-import re
+from agents.java_parser import parse_java
+from agents.symbol_index import get_symbol_index
+from utils.file_cache import read_text, write_text
 
 class PackageStructureNormalizerAgent:
     def __init__(self, migrated_dir: str, base_package: str = "com.migrated"):
         self.migrated_dir = migrated_dir
         self.base_package = base_package
+        self.symbols = get_symbol_index(migrated_dir)
 
     def normalize_file(self, relative_path: str) -> dict:
         full_path = os.path.join(self.migrated_dir, relative_path)
         if not os.path.exists(full_path):
             return {"status": "skipped", "reason": "File not found", "file": relative_path}
 
-        with open(full_path, "r", encoding="utf-8") as f:
-            code = f.read()
+        code = read_text(full_path)
 
         # Remove any existing package line
-        code = re.sub(r'^\s*package\s+[\w\.]+;\s*', '', code, flags=re.MULTILINE)
+        package_span = parse_java(code)["package_span"]
+        if package_span:
+            code = code[:package_span[0]] + code[package_span[1]:].lstrip()
 
         # Infer package from path
         path_after_src = relative_path.replace("\\", "/")
@@ -35,8 +39,8 @@ class PackageStructureNormalizerAgent:
         fixed_code = f"package {package};\n\n{code}"
 
         # Write updated file
-        with open(full_path, "w", encoding="utf-8") as f:
-            f.write(fixed_code)
+        write_text(full_path, fixed_code)
+        self.symbols.update_file(relative_path)
 
         return {
             "status": "normalized",
@@ -0,0 +1,145 @@
+# agents/query_embedding_cache.py
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+import numpy as np
+
+
+class QueryEmbeddingCache:
+    """
+    Content-addressed cache of query embeddings, keyed by sha256(model, text).
+
+    Lookups go through an in-memory LRU first, then a persistent directory of `.npy`
+    files. The directory is capped at `max_disk_bytes`; when it grows past the cap the
+    least recently used files (by mtime, refreshed on every disk hit) are evicted.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "data/query_embeddings",
+        model: str = "text-embedding-3-small",
+        memory_entries: int = 512,
+        max_disk_bytes: int = 256 * 1024 * 1024
+    ):
+        self.cache_dir = cache_dir
+        self.model = model
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory: OrderedDict = OrderedDict()
+        self._disk_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npy")
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = self.key(text)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        path = self._path_for(key)
+        try:
+            vector = np.load(path)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self._remember(key, vector)
+        return vector
+
+    def put(self, text: str, vector):
+        key = self.key(text)
+        vector = np.asarray(vector, dtype=np.float32)
+        path = self._path_for(key)
+        written = 0
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, vector)
+            os.replace(tmp_path, path)
+            written = os.path.getsize(path)
+        except OSError as e:
+            print(f"⚠️ Could not persist query embedding: {e}")
+
+        with self._lock:
+            self._remember(key, vector)
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_bytes()
+            else:
+                self._disk_bytes += written
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict()
+
+    def get_or_embed(self, text: str, embed: Callable[[str], list]) -> np.ndarray:
+        vector = self.get(text)
+        if vector is None:
+            vector = np.asarray(embed(text), dtype=np.float32)
+            self.put(text, vector)
+        return vector
+
+    def get_or_embed_many(self, texts: List[str], embed_many: Callable[[List[str]], list]) -> List[np.ndarray]:
+        """
+        Resolves a batch of texts, sending only the cache misses to `embed_many` in one call.
+        """
+        vectors = [self.get(text) for text in texts]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            embedded = embed_many([texts[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = np.asarray(vector, dtype=np.float32)
+                self.put(texts[i], vectors[i])
+        return vectors
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _list_disk_entries(self) -> List[os.DirEntry]:
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        with os.scandir(self.cache_dir) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as files:
+                    entries.extend(f for f in files if f.name.endswith(".npy"))
+        return entries
+
+    def _scan_disk_bytes(self) -> int:
+        return sum(entry.stat().st_size for entry in self._list_disk_entries())
+
+    def _evict(self):
+        # Trim to 90% of the cap so a full cache does not rescan on every put
+        target = int(self.max_disk_bytes * 0.9)
+        entries = sorted(self._list_disk_entries(), key=lambda e: e.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                total -= size
+            except OSError:
+                continue
+        self._disk_bytes = total
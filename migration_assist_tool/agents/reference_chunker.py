@@ -0,0 +1,84 @@
+# agents/reference_chunker.py
+
+from typing import List
+from agents.java_parser import parse_java
+
+
+def java_chunks(code: str) -> List[dict]:
+    """
+    Splits Java source into a class-level chunk (package, imports, declaration and fields
+    up to the first member) plus one chunk per method, constructor, initializer or nested type.
+    """
+    parsed = parse_java(code)
+    types = parsed["types"]
+    chunks = []
+    region_start = 0
+
+    for index, decl in enumerate(types):
+        if decl["parent"] is not None:
+            continue
+        members = [
+            (m["start"], m["end"], m["name"]) for m in parsed["methods"]
+            if m["type_index"] == index and m["body_start"] is not None
+        ]
+        members += [
+            (b["start"], b["end"], "static" if b["static"] else "init") for b in parsed["initializers"]
+            if b["type_index"] == index
+        ]
+        members += [(t["start"], t["end"], t["name"]) for t in types if t["parent"] == index]
+        members.sort()
+
+        # Types without member bodies (interfaces, plain records) are one chunk
+        class_end = members[0][0] if members else decl["end"]
+        chunks.append({"name": decl["name"], "start": region_start, "end": class_end})
+        chunks.extend({"name": f"{decl['name']}.{name}", "start": start, "end": end} for start, end, name in members)
+        region_start = decl["end"]
+
+    if not chunks and code.strip():
+        chunks.append({"name": "", "start": 0, "end": len(code)})
+    return chunks
+
+
+def _split_by_lines(code: str, chunk: dict, encoder, max_tokens: int) -> List[dict]:
+    pieces = []
+    start = chunk["start"]
+    tokens = 0
+    pos = start
+    while pos < chunk["end"]:
+        line_end = code.find("\n", pos, chunk["end"])
+        line_end = chunk["end"] if line_end == -1 else line_end + 1
+        line_tokens = len(encoder.encode(code[pos:line_end]))
+        if tokens and tokens + line_tokens > max_tokens:
+            pieces.append({"start": start, "end": pos, "tokens": tokens})
+            start, tokens = pos, 0
+        tokens += line_tokens
+        pos = line_end
+    if pos > start:
+        pieces.append({"start": start, "end": pos, "tokens": tokens})
+
+    if len(pieces) == 1:
+        return [{**chunk, "tokens": pieces[0]["tokens"]}]
+    return [{**piece, "name": f"{chunk['name']}[{k}]"} for k, piece in enumerate(pieces)]
+
+
+def chunk_reference_file(path: str, code: str, encoder, max_chunk_tokens: int = 800) -> List[dict]:
+    """
+    Returns the chunks to embed for one reference file as dicts with name, start, end
+    (character offsets into `code`) and tokens. Java files are split at member boundaries;
+    anything still over `max_chunk_tokens`, and every other file type, is split by lines.
+    """
+    if path.endswith(".java"):
+        spans = java_chunks(code)
+    else:
+        spans = [{"name": "", "start": 0, "end": len(code)}] if code.strip() else []
+
+    chunks = []
+    for span in spans:
+        if not code[span["start"]:span["end"]].strip():
+            continue
+        tokens = len(encoder.encode(code[span["start"]:span["end"]]))
+        if tokens <= max_chunk_tokens:
+            chunks.append({**span, "tokens": tokens})
+        else:
+            chunks.extend(_split_by_lines(code, span, encoder, max_chunk_tokens))
+    return chunks
@@ -1,92 +1,462 @@
 import os
 import hashlib
-import json
-from typing import List, Tuple
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Tuple
 from dotenv import load_dotenv
-import tiktoken
-from pathlib import Path
+import numpy as np
+from agents.ann_index import IVFIndex
+from agents.embedding_store import EmbeddingStore
+from agents.reference_chunker import chunk_reference_file
+from agents.query_embedding_cache import QueryEmbeddingCache
 from utils.llm_loader import get_embedding_client  # ✅ Unified embedding loader
+from utils.tokenizer import get_encoder
+from utils.tracing import span
 
 load_dotenv()
 
+_shared_promoters: Dict[Tuple[str, str], "ReferencePromoterAgent"] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_promoter(reference_dir: str, model: str = None) -> "ReferencePromoterAgent":
+    """
+    Returns the process-wide promoter for (reference_dir, model), creating it on first use.
+    `model` defaults to the embedding client's model (EMBEDDING_MODEL or the Azure deployment).
+    The embedding index itself is built lazily, at most once, on the first search.
+    """
+    model = model or get_embedding_client().embedding_model
+    key = (os.path.abspath(reference_dir), model)
+    with _shared_lock:
+        promoter = _shared_promoters.get(key)
+        if promoter is None:
+            promoter = ReferencePromoterAgent(reference_dir, model=model)
+            _shared_promoters[key] = promoter
+        return promoter
+
+
 class ReferencePromoterAgent:
-    def __init__(self, reference_dir: str, cache_path: str = "data/reference_embeddings.json", model="text-embedding-3-small"):
+    def __init__(
+        self,
+        reference_dir: str,
+        cache_path: str = "data/reference_embeddings.json",
+        model=None,
+        content_cache_size: int = 256,
+        embed_batch_tokens: int = 100_000,
+        embed_batch_size: int = 256,
+        embed_concurrency: int = None,
+        checkpoint_every: int = 10,
+        max_chunk_tokens: int = 800,
+        ann_threshold: int = 50_000,
+        ann_nprobe: int = 8
+    ):
         self.reference_dir = reference_dir
         self.cache_path = cache_path
-        self.model = model
-        self.client = get_embedding_client()  # ✅ Now supports Azure & OpenAI
-        self.embeddings = {}
-        self.encoder = tiktoken.encoding_for_model("gpt-4")
+        self.client = get_embedding_client()  # ✅ Now supports Azure & OpenAI; throttled to EMBED_RPM / EMBED_TPM
+        self.model = model or self.client.embedding_model
+        self.encoder = get_encoder("gpt-4")
+
+        # Binary store lives next to the legacy JSON cache: <name>.npy + <name>.meta.json
+        self.store = EmbeddingStore(os.path.splitext(cache_path)[0])
+
+        # Row-aligned search index: one pre-normalized float32 row per (path, chunk)
+        self.max_chunk_tokens = max_chunk_tokens
+        self._rows: List[Tuple[str, dict]] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+
+        # Above `ann_threshold` chunks, searches go through an IVF index persisted next to the store
+        self.ann_threshold = ann_threshold
+        self.ann_path = os.path.splitext(cache_path)[0] + ".ivf.npz"
+        self._ann = IVFIndex(nprobe=ann_nprobe)
+
+        # Bounded LRU of reference file contents, keyed by (path, content hash)
+        self.content_cache_size = content_cache_size
+        self._content_cache: OrderedDict = OrderedDict()
+
+        # Batched ingestion: batches are capped by token budget and input count
+        # and run `embed_concurrency` at a time
+        self.embed_batch_tokens = embed_batch_tokens
+        self.embed_batch_size = embed_batch_size
+        self.max_input_tokens = 8191
+        self.embed_concurrency = embed_concurrency or int(os.getenv("EMBED_CONCURRENCY", "4"))
+        self.checkpoint_every = checkpoint_every
+
+        # Query vectors are cached by content hash, so repeat lookups skip the network
+        self.query_cache = QueryEmbeddingCache(
+            os.path.join(os.path.dirname(cache_path), "query_embeddings"),
+            model=self.model
+        )
+
+        self._index_lock = threading.Lock()
+        self._index_built = False
+        # Searches may run from several fix workers at once
+        self._content_lock = threading.Lock()
+        self._ann_lock = threading.Lock()
         self._load_or_init_cache()
 
     def _load_or_init_cache(self):
-        if os.path.exists(self.cache_path):
-            with open(self.cache_path, "r", encoding="utf-8") as f:
-                self.embeddings = json.load(f)
-        else:
-            self.embeddings = {}
+        if not self.store.exists() and os.path.exists(self.cache_path):
+            # Whole-file vectors cannot stand in for chunk vectors, so the old cache is not imported
+            print(f"📦 {self.cache_path} holds whole-file embeddings; reference files will be re-indexed by chunk.")
+        self._rebuild_matrix()
 
     def _save_cache(self):
-        with open(self.cache_path, "w", encoding="utf-8") as f:
-            json.dump(self.embeddings, f)
+        self.store.save()
 
     def _hash_file(self, content: str) -> str:
         return hashlib.md5(content.encode("utf-8")).hexdigest()
 
-    def _list_relevant_files(self) -> List[Path]:
-        valid_exts = [".java", ".gradle", ".xml", ".properties", ".yml", ".yaml", ".md"]
-        paths = []
-        for root, _, files in os.walk(self.reference_dir):
-            for f in files:
-                if any(f.endswith(ext) for ext in valid_exts):
-                    paths.append(Path(root) / f)
-        return paths
+    def _scan_reference_files(self) -> Dict[str, os.stat_result]:
+        """
+        Walks reference_dir with os.scandir and returns {path: stat} for every relevant file.
+        """
+        valid_exts = (".java", ".gradle", ".xml", ".properties", ".yml", ".yaml", ".md")
+        found = {}
+        stack = [self.reference_dir]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.endswith(valid_exts) and entry.is_file():
+                            found[entry.path] = entry.stat()
+            except OSError as e:
+                print(f"⚠️ Cannot scan {directory}: {e}")
+        return found
+
+    def _stat_signature(self, stat: os.stat_result) -> dict:
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "inode": stat.st_ino}
+
+    def ensure_index(self):
+        """
+        Builds the embedding index once per process; later calls return immediately.
+        """
+        if self._index_built:
+            return
+        with self._index_lock:
+            if not self._index_built:
+                with span("embed.index", reference_dir=self.reference_dir):
+                    self.build_embedding_index()
+                # Only once the build succeeded: the lock-free check above must never see a partial index
+                self._index_built = True
 
     def build_embedding_index(self):
-        files = self._list_relevant_files()
-        updated = 0
-        for path in files:
-            path_str = str(path)
+        """
+        Incrementally syncs the index with reference_dir. Files whose (size, mtime_ns, inode)
+        match the index are trusted without being opened; changed files are re-hashed and only
+        re-embedded if their content differs; entries for vanished files are evicted.
+        """
+        files = self._scan_reference_files()
+
+        stale = [path for path in self.store.files if path not in files]
+        for path in stale:
+            self.store.remove(path)
+
+        updated = len(stale)
+        rehashed = 0
+        to_embed = []
+        for path_str, stat in files.items():
+            signature = self._stat_signature(stat)
+            entry = self.store.get(path_str)
+            if entry and all(entry.get(key) == value for key, value in signature.items()):
+                continue
             try:
                 with open(path_str, "r", encoding="utf-8") as f:
                     content = f.read()
                 content_hash = self._hash_file(content)
-                if path_str in self.embeddings and self.embeddings[path_str]["hash"] == content_hash:
+                if entry and entry["hash"] == content_hash:
+                    # Touched but unchanged: refresh the stat signature, keep the vectors
+                    self.store.update(path_str, **signature)
+                    rehashed += 1
                     continue
-                vector = self.client.embed_query(content)
-                self.embeddings[path_str] = {"hash": content_hash, "embedding": vector}
-                updated += 1
+                to_embed.append({"path": path_str, "bytes": len(content.encode("utf-8"))})
             except Exception as e:
                 print(f"⚠️ Error indexing {path_str}: {e}")
+
+        if stale or rehashed or to_embed:
+            print(
+                f"♻️ Reference index: {len(files) - rehashed - len(to_embed)} unchanged, "
+                f"{rehashed} re-hashed, {len(to_embed)} to embed, {len(stale)} evicted"
+            )
+        updated += rehashed
+        if to_embed:
+            updated += self._ingest(to_embed)
         if updated > 0:
             self._save_cache()
+            self._rebuild_matrix()
+
+    def _plan_batches(self, items: List[dict]) -> List[List[dict]]:
+        """
+        Groups files into embed_documents requests bounded by token budget and input count.
+        Token counts are estimated from byte size here; exact counts are taken when chunking.
+        A file's chunks always travel in the same batch.
+        """
+        batches, current, current_tokens = [], [], 0
+        for item in items:
+            tokens = min(item["bytes"] // 4 + 1, self.max_input_tokens)
+            if current and (current_tokens + tokens > self.embed_batch_tokens or len(current) >= self.embed_batch_size):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(item)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_batch(self, batch: List[dict]):
+        with span("embed.batch", files=len(batch)) as attrs:
+            records, vectors, batch_tokens = self._read_and_embed(batch)
+            attrs["tokens"] = batch_tokens
+            return records, vectors, batch_tokens
+
+    def _read_and_embed(self, batch: List[dict]):
+        prepared = []
+        for item in batch:
+            try:
+                prepared.append(self._prepare_file(item["path"]))
+            except Exception as e:
+                # One unreadable file must not cost the rest of its batch
+                print(f"⚠️ Skipping reference file {item['path']}: {e}")
+        return self._embed_prepared(prepared)
+
+    def _prepare_file(self, path: str) -> tuple:
+        """
+        Reads and chunks one file: ((path, hash, metadata, chunks), chunk texts, tokens).
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        chunks = chunk_reference_file(path, content, self.encoder, self.max_chunk_tokens)
+        texts, tokens = [], 0
+        for chunk in chunks:
+            text = content[chunk["start"]:chunk["end"]]
+            if chunk["tokens"] > self.max_input_tokens:
+                text = self.encoder.decode(self.encoder.encode(text)[:self.max_input_tokens])
+            texts.append(text)
+            tokens += min(chunk["tokens"], self.max_input_tokens)
+        return (path, self._hash_file(content), self._content_metadata(path, content), chunks), texts, tokens
+
+    def _embed_prepared(self, prepared: List[tuple]):
+        """
+        Embeds prepared files in one request; returns (records, vectors, tokens) with one
+        vector per chunk of the returned records. A failed request is split in halves so a
+        single file the provider rejects is dropped alone.
+        """
+        texts = [text for _, file_texts, _ in prepared for text in file_texts]
+        batch_tokens = sum(tokens for _, _, tokens in prepared)
+        records = [record for record, _, _ in prepared]
+        if not texts:
+            return records, [], 0
+        try:
+            vectors = self.client.embed_documents(texts, model=self.model, tokens=batch_tokens)
+            if len(vectors) != len(texts):
+                raise ValueError(f"embedding provider returned {len(vectors)} vectors for {len(texts)} inputs")
+            return records, list(vectors), batch_tokens
+        except Exception as e:
+            if len(prepared) == 1:
+                print(f"⚠️ Embedding {records[0][0]} failed: {e}")
+                return [], [], 0
+            print(f"⚠️ Embedding a batch of {len(prepared)} files failed ({e}); retrying in halves")
+        half = len(prepared) // 2
+        left_records, left_vectors, left_tokens = self._embed_prepared(prepared[:half])
+        right_records, right_vectors, right_tokens = self._embed_prepared(prepared[half:])
+        return left_records + right_records, left_vectors + right_vectors, left_tokens + right_tokens
+
+    def _ingest(self, items: List[dict]) -> int:
+        """
+        Embeds `items` in concurrent batches. Progress is checkpointed to the store every
+        `checkpoint_every` batches and on exit, so an interrupted build resumes where it stopped.
+        """
+        batches = self._plan_batches(items)
+        print(f"🧮 Embedding {len(items)} reference files in {len(batches)} batches...")
+
+        embedded_files = embedded_tokens = completed = 0
+        start = time.monotonic()
+        pool = ThreadPoolExecutor(max_workers=self.embed_concurrency)
+        try:
+            futures = [pool.submit(self._embed_batch, batch) for batch in batches]
+            for future in as_completed(futures):
+                try:
+                    records, vectors, batch_tokens = future.result()
+                except Exception as e:
+                    print(f"⚠️ Embedding batch failed: {e}")
+                    continue
+                offset = 0
+                for path, content_hash, metadata, chunks in records:
+                    file_vectors = self._normalize(np.asarray(vectors[offset:offset + len(chunks)], dtype=np.float32))
+                    self.store.put(path, file_vectors, chunks, content_hash, **metadata)
+                    offset += len(chunks)
+                embedded_files += len(records)
+                embedded_tokens += batch_tokens
+                completed += 1
+                if completed % self.checkpoint_every == 0:
+                    self._save_cache()
+                    print(f"💾 Checkpointed {embedded_files}/{len(items)} files")
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._save_cache()
+
+        elapsed = max(time.monotonic() - start, 1e-9)
+        print(
+            f"📈 Embedded {embedded_files} files ({embedded_tokens} tokens) in {elapsed:.1f}s — "
+            f"{embedded_files / elapsed:.1f} files/s, {embedded_tokens / elapsed:.0f} tokens/s"
+        )
+        return embedded_files
+
+    def _content_metadata(self, path: str, content: str) -> dict:
+        return {
+            "tokens": self._token_count(content),
+            "bytes": len(content.encode("utf-8")),
+            **self._stat_signature(os.stat(path))
+        }
+
+    def _rebuild_matrix(self):
+        """
+        Points the search index at the store's contiguous, L2-normalized float32 matrix
+        so cosine similarity against the whole index is a single matrix product.
+        Vectors are normalized before they are stored, so this is free for a saved store.
+        """
+        self._rows, self._matrix = self.store.view()
+
+    def _use_ann(self) -> bool:
+        """
+        Brute force is exact and fast enough for small indexes; large ones use the IVF index,
+        which is loaded from disk or retrained whenever the store generation changes.
+        """
+        if len(self._rows) < self.ann_threshold:
+            return False
+        with self._ann_lock:
+            if self._ann.generation != self.store.generation:
+                if not (self._ann.load(self.ann_path) and self._ann.generation == self.store.generation):
+                    print(f"🧭 Training ANN index over {len(self._rows)} reference chunks...")
+                    start = time.monotonic()
+                    self._ann.build(self._matrix, generation=self.store.generation)
+                    self._ann.save(self.ann_path)
+                    print(f"🧭 ANN index ready in {time.monotonic() - start:.1f}s")
+        return True
+
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
 
-    def _cosine_similarity(self, vec1, vec2):
-        dot = sum(a * b for a, b in zip(vec1, vec2))
-        norm1 = sum(a * a for a in vec1) ** 0.5
-        norm2 = sum(b * b for b in vec2) ** 0.5
-        return dot / (norm1 * norm2)
+    def _top_k_indices(self, scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Returns the indices of the k highest scores, best first, using a partial sort.
+        """
+        if k <= 0 or scores.size == 0:
+            return np.empty(0, dtype=np.int64)
+        if k >= scores.size:
+            return np.argsort(-scores)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
 
     def _token_count(self, text: str) -> int:
         return len(self.encoder.encode(text))
 
+    def _eligible_mask(self, max_tokens: int) -> np.ndarray:
+        """
+        Row mask of reference chunks within the token budget, taken from index metadata.
+        Rows with unknown token counts (NaN) compare False and are excluded.
+        """
+        return self.store.column("tokens") <= max_tokens
+
+    def _read_reference(self, path: str) -> str:
+        content_hash = self.store.get(path)["hash"]
+        key = (path, content_hash)
+        with self._content_lock:
+            if key in self._content_cache:
+                self._content_cache.move_to_end(key)
+                return self._content_cache[key]
+
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        with self._content_lock:
+            self._content_cache[key] = content
+            if len(self._content_cache) > self.content_cache_size:
+                self._content_cache.popitem(last=False)
+        return content
+
+    def _rank_exact(self, queries: np.ndarray, mask: np.ndarray, k: int) -> List[np.ndarray]:
+        """
+        Exact top-k matrix rows for each row of `queries`, best first. The metadata mask
+        selects the candidate rows first, so only those are gathered and scored.
+        """
+        candidates = np.flatnonzero(mask)
+        if candidates.size == 0:
+            return [np.empty(0, dtype=np.int64) for _ in queries]
+        if candidates.size == mask.size:
+            return [self._top_k_indices(scores, k) for scores in queries @ self._matrix.T]
+        # Gathered in row order, so the memory map is read sequentially
+        scores_matrix = queries @ np.asarray(self._matrix[candidates], dtype=np.float32).T
+        return [candidates[self._top_k_indices(scores, k)] for scores in scores_matrix]
+
+    def _collect_matches(self, ranked: np.ndarray, top_k: int) -> List[Tuple[str, str]]:
+        """
+        Reads only the winning chunks, best first. `ranked` carries a few spare candidates
+        so a reference file that can no longer be opened does not shrink the result.
+        """
+        results = []
+        for idx in ranked:
+            path, chunk = self._rows[idx]
+            try:
+                results.append((path, self._read_reference(path)[chunk["start"]:chunk["end"]]))
+            except Exception:
+                continue
+            if len(results) == top_k:
+                break
+        return results
+
     def search_similar_files(self, query_code: str, top_k: int = 3, max_tokens: int = 3000) -> List[Tuple[str, str]]:
+        self.ensure_index()
+        with span("embed.search", top_k=top_k) as attrs:
+            matches = self._search_similar_files(query_code, top_k, max_tokens)
+            attrs["matches"] = len(matches)
+            return matches
+
+    def _search_similar_files(self, query_code: str, top_k: int, max_tokens: int) -> List[Tuple[str, str]]:
         try:
-            query_embed = self.client.embed_query(query_code)
+            query_embed = self.query_cache.get_or_embed(query_code, lambda text: self.client.embed_query(text, model=self.model))
         except Exception as e:
             print(f"❌ Embedding failed for query: {e}")
             return []
 
-        scored_files = []
-        for path, meta in self.embeddings.items():
-            try:
-                sim = self._cosine_similarity(query_embed, meta["embedding"])
-                with open(path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                if self._token_count(content) <= max_tokens:
-                    scored_files.append((path, content, sim))
-            except Exception:
-                continue
+        if not self._rows or top_k <= 0:
+            return []
 
-        top = sorted(scored_files, key=lambda x: x[2], reverse=True)[:top_k]
-        return [(path, content) for path, content, _ in top]
+        query = self._normalize(np.asarray(query_embed, dtype=np.float32))
+        mask = self._eligible_mask(max_tokens)
+        if self._use_ann():
+            ranked, _ = self._ann.search(self._matrix, query, top_k * 2, mask)
+        else:
+            ranked = self._rank_exact(query[np.newaxis, :], mask, top_k * 2)[0]
+        return self._collect_matches(ranked, top_k)
+
+    def search_many(self, queries: List[str], top_k: int = 3, max_tokens: int = 3000) -> List[List[Tuple[str, str]]]:
+        """
+        Scores a batch of query files against the index with a single matrix product
+        (or one IVF probe per query on large indexes).
+        Returns one result list per query, in the same order as `queries`.
+        """
+        if not queries:
+            return []
+        self.ensure_index()
+        try:
+            query_embeds = self.query_cache.get_or_embed_many(queries, lambda texts: self.client.embed_documents(texts, model=self.model))
+        except Exception as e:
+            print(f"❌ Embedding failed for query batch: {e}")
+            return [[] for _ in queries]
+
+        if not self._rows or top_k <= 0:
+            return [[] for _ in queries]
+
+        query_matrix = self._normalize(np.asarray(query_embeds, dtype=np.float32))
+        mask = self._eligible_mask(max_tokens)
+        if self._use_ann():
+            ranked = [self._ann.search(self._matrix, query, top_k * 2, mask)[0] for query in query_matrix]
+        else:
+            ranked = self._rank_exact(query_matrix, mask, top_k * 2)
+        return [self._collect_matches(indices, top_k) for indices in ranked]
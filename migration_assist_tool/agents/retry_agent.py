@@ -1,22 +1,35 @@
 import os
-import subprocess
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from agents.fix_and_compile import FixAndCompileAgent
 from agents.build_fixer_agent import BuildFixerAgent
+from agents.build_validator import BuildValidatorAgent
+from agents.incremental_compiler import IncrementalCompiler
 from agents.context_stitcher import ContextStitcherAgent
+from agents.mapping_loader import MappingLoader
+from agents.run_journal import RunJournal
+from utils.tracing import span
 
 class RetryAgent:
-    def __init__(self, migrated_dir, legacy_dir, enterprise_dir, reference_dir, max_retries=3):
+    def __init__(self, migrated_dir, legacy_dir, enterprise_dir, reference_dir, max_retries=3, workers=None, llm_concurrency=None,
+                 journal: RunJournal = None):
         self.migrated_dir = migrated_dir
         self.legacy_dir = legacy_dir
         self.enterprise_dir = enterprise_dir
         self.reference_dir = reference_dir
         self.max_retries = max_retries
+        # Optional run journal: settled targets are skipped and attempts carry over on resume
+        self.journal = journal
+        # Fix workers mostly wait on the LLM and javac, so threads overlap that I/O
+        self.workers = max(1, workers or int(os.getenv("FIX_WORKERS", "4")))
 
         self.fixer = FixAndCompileAgent(
             legacy_dir=legacy_dir,
             migrated_dir=migrated_dir,
             enterprise_dir=enterprise_dir,
-            reference_dir=reference_dir
+            reference_dir=reference_dir,
+            llm_concurrency=llm_concurrency
         )
         self.context_builder = ContextStitcherAgent(
             legacy_dir=legacy_dir,
@@ -25,51 +38,318 @@ class RetryAgent:
             reference_dir=reference_dir
         )
         self.build_fixer = BuildFixerAgent(migrated_dir)
+        self.validator = BuildValidatorAgent(migrated_dir)
+        self.compiler = IncrementalCompiler(migrated_dir)
+
+        self._worker_ids = itertools.count(1)
+        self._worker_local = threading.local()
+
+    def _worker_output_dir(self) -> str:
+        # Each worker compiles into its own directory so concurrent javac runs never share class files
+        if not hasattr(self._worker_local, "output_dir"):
+            self._worker_local.output_dir = os.path.join(".buildcheck", "bin", f"worker-{next(self._worker_ids)}")
+        return self._worker_local.output_dir
+
+    def _mark(self, target_path: str, state: str, sources: list, attempts=None):
+        if self.journal:
+            self.journal.mark(target_path, state, sources, attempts)
 
     def check_single_file_compiles(self, java_path: str) -> bool:
         try:
-            output_dir = ".buildcheck/bin"
-            os.makedirs(output_dir, exist_ok=True)
-            cmd = ["javac", "-d", output_dir, java_path]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            return result.returncode == 0
+            return self.compiler.check_file(java_path, self._worker_output_dir())
         except Exception as e:
             print(f"⚠️ Compile check failed: {e}")
             return False
 
-    def retry_fix_and_build(self, migration_map):
+    def _plan_targets(self, migration_map) -> list:
+        """
+        One job per distinct target path, in mapping order. A target listed by several
+        mapping entries is fixed once with all of their sources, so no file is ever
+        edited by two workers at the same time.
+        """
+        jobs = {}
         for file_entry in migration_map:
             source_paths = file_entry.get("source", [])
-            target_paths = file_entry.get("target", [])
-            for target_path in target_paths:
-                target_file_path = os.path.join(self.migrated_dir, target_path)
+            for target_path in file_entry.get("target", []):
+                job = jobs.setdefault(os.path.normpath(target_path), {"target": target_path, "sources": []})
+                job["sources"].extend(p for p in source_paths if p not in job["sources"])
+        return list(jobs.values())
 
-                # Skip if file already compiles
-                if self.check_single_file_compiles(target_file_path):
-                    print(f"✅ {target_path} compiles. Skipping fix.")
-                    continue
+    def _fix_target(self, target_path: str, source_paths: list) -> dict:
+        with span("retry.target", file=target_path) as attrs:
+            result = self._fix_target_attempts(target_path, source_paths)
+            attrs.update(status=result["status"], attempts=result["attempts"])
+            return result
 
-                success = False
-                for attempt in range(self.max_retries):
-                    print(f"🔁 Attempt {attempt+1} to fix and compile {target_path}")
-                    fix_result = self.fixer.fix_file(
-                        target_path=target_path,
-                        source_paths=source_paths,
-                        enterprise_refs=[],
-                        stitcher=self.context_builder
-                    )
-
-                    # Check again if file compiles after fix
-                    if self.check_single_file_compiles(target_file_path):
-                        print(f"✅ {target_path} compiles after fix.")
-                        success = True
-                        break
-                    else:
-                        print(f"❌ {target_path} still fails to compile.")
+    def _fix_target_attempts(self, target_path: str, source_paths: list) -> dict:
+        target_file_path = os.path.join(self.migrated_dir, target_path)
+        # Attempts made before an interrupted run count towards the limit
+        previous = self.journal.attempts(target_path) if self.journal else 0
+
+        # Skip if file already compiles
+        if self.check_single_file_compiles(target_file_path):
+            print(f"✅ {target_path} compiles. Skipping fix.")
+            self._mark(target_path, "fixed", source_paths, previous)
+            return {"target": target_path, "status": "skipped", "attempts": 0}
+
+        for attempt in range(previous, self.max_retries):
+            print(f"🔁 Attempt {attempt+1} to fix and compile {target_path}")
+            self._mark(target_path, "compiling", source_paths, attempt + 1)
+            with span("retry.attempt", file=target_path, attempt=attempt + 1) as attrs:
+                self.fixer.fix_file(
+                    target_path=target_path,
+                    source_paths=source_paths,
+                    enterprise_refs=[],
+                    stitcher=self.context_builder
+                )
 
-                if not success:
-                    print(f"🚨 {target_path} could not be compiled after {self.max_retries} attempts.")
+                # Check again if file compiles after fix
+                attrs["compiles"] = self.check_single_file_compiles(target_file_path)
+            if attrs["compiles"]:
+                print(f"✅ {target_path} compiles after fix.")
+                self._mark(target_path, "fixed", source_paths)
+                return {"target": target_path, "status": "fixed", "attempts": attempt + 1 - previous}
+            print(f"❌ {target_path} still fails to compile.")
+
+        print(f"🚨 {target_path} could not be compiled after {self.max_retries} attempts.")
+        self._mark(target_path, "gave_up", source_paths, max(previous, self.max_retries))
+        return {"target": target_path, "status": "failed", "attempts": max(self.max_retries - previous, 0)}
+
+    def _run_job(self, job: dict) -> dict:
+        try:
+            return self._fix_target(job["target"], job["sources"])
+        except Exception as e:
+            print(f"🚨 Fixing {job['target']} raised: {e}")
+            return {"target": job["target"], "status": "failed", "attempts": 0, "error": str(e)}
+
+    def retry_fix_and_build(self, migration_map) -> list:
+        """
+        Fixes every mapped target with up to `workers` targets in flight.
+        Returns one result per target in mapping order, whatever order they finished in.
+        """
+        jobs = self._plan_targets(migration_map)
+        resumed = {}
+        if self.journal:
+            # Targets settled by an earlier attempt at this run are not checked again
+            for job in jobs:
+                if self.journal.settled(job["target"], job["sources"]):
+                    state = self.journal.state(job["target"])
+                    resumed[job["target"]] = {
+                        "target": job["target"], "status": "fixed" if state == "fixed" else "failed", "attempts": 0, "resumed": True
+                    }
+            if resumed:
+                print(f"♻️ {len(resumed)}/{len(jobs)} targets already settled in run {self.journal.run_id}")
+        all_jobs, jobs = jobs, [job for job in jobs if job["target"] not in resumed]
+
+        # One batched check up front; unchanged files are answered from the verdict cache
+        initial = self.compiler.check([job["target"] for job in jobs])
+        failing = sum(1 for verdict in initial.values() if not verdict["success"])
+        print(f"🔎 {failing}/{len(jobs)} targets fail to compile ({self.compiler.stats['cached']} verdicts cached)")
+        print(f"🧵 Fixing {len(jobs)} targets with {min(self.workers, max(len(jobs), 1))} workers")
+
+        if self.workers == 1 or len(jobs) <= 1:
+            results = [self._run_job(job) for job in jobs]
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fix") as pool:
+                results = list(pool.map(self._run_job, jobs))
+        self.compiler.save()
+        by_target = {r["target"]: r for r in results}
+        by_target.update(resumed)
+        results = [by_target[job["target"]] for job in all_jobs]
 
         # After all files compile, try Gradle build
         print("🚀 All file fixes attempted. Triggering Gradle build...")
         # Add your actual Gradle build trigger logic here
+        return results
+
+    def retry_fixes(self, mapping: MappingLoader) -> dict:
+        """
+        Runs retry_fix_and_build over a MappingLoader and summarizes the outcome.
+        """
+        if not mapping.get_all_mappings():
+            mapping.load()
+        migration_map = [
+            {"source": entry["sourcePaths"], "target": entry["targetPaths"]}
+            for entry in mapping.get_all_mappings()
+        ]
+        results = self.retry_fix_and_build(migration_map)
+
+        failed = [r["target"] for r in results if r["status"] == "failed"]
+        return {
+            "status": "failed" if failed else "success",
+            "retry_attempts": sum(r["attempts"] for r in results),
+            "failed_targets": failed,
+            "results": results
+        }
+
+    def _route_diagnostics(self, errors: list) -> tuple:
+        """
+        Groups build errors by migrated file (relative path). Errors that point outside the
+        migrated tree, or at no file, are returned separately.
+        """
+        migrated_root = os.path.abspath(self.migrated_dir)
+        by_file, unrouted = {}, []
+        for error in errors:
+            if not error["file"]:
+                unrouted.append(error)
+                continue
+            full_path = error["file"] if os.path.isabs(error["file"]) else os.path.join(migrated_root, error["file"])
+            rel_path = os.path.relpath(os.path.abspath(full_path), migrated_root)
+            if rel_path.startswith(".."):
+                unrouted.append(error)
+            else:
+                by_file.setdefault(rel_path, []).append(error)
+        return by_file, unrouted
+
+    def _repair_file(self, job: dict) -> dict:
+        with span("repair.file", file=job["target"], errors=len(job["diagnostics"])) as attrs:
+            result = self._repair_file_once(job)
+            attrs["status"] = result["status"]
+            return result
+
+    def _repair_file_once(self, job: dict) -> dict:
+        self._mark(job["target"], "compiling", job["sources"], job["attempt"])
+        try:
+            result = self.fixer.fix_file(
+                target_path=job["target"],
+                source_paths=job["sources"],
+                enterprise_refs=[],
+                stitcher=self.context_builder,
+                diagnostics=job["diagnostics"]
+            )
+            status = result["fix_log"].get("status", "failed")
+            # Whether the fix holds is decided by the next build; until then it is only applied
+            self._mark(job["target"], "fixed" if status == "success" else "pending", job["sources"])
+            return {"target": job["target"], "status": "fixed" if status == "success" else "failed", "errors": len(job["diagnostics"])}
+        except Exception as e:
+            print(f"🚨 Fixing {job['target']} raised: {e}")
+            self._mark(job["target"], "pending", job["sources"])
+            return {"target": job["target"], "status": "failed", "errors": len(job["diagnostics"]), "error": str(e)}
+
+    def _repair_waves(self, jobs: list) -> list:
+        """
+        Groups a round's jobs by dependency depth among themselves: wave 0 holds files that
+        depend on no other job, wave n files whose job dependencies are all in earlier
+        waves. Files in a dependency cycle, and files that depend on them, share the last wave.
+        """
+        targets = {os.path.normpath(job["target"]): job for job in jobs}
+        depends_on = {target: set() for target in targets}
+        for target in targets:
+            for dependent in self.compiler.dependents([target]):
+                dependent = os.path.normpath(dependent)
+                if dependent in targets:
+                    depends_on[dependent].add(target)
+
+        waves, placed = [], set()
+        while len(placed) < len(targets):
+            wave = sorted(t for t in targets if t not in placed and depends_on[t] <= placed)
+            if not wave:
+                wave = sorted(t for t in targets if t not in placed)
+            waves.append([targets[t] for t in wave])
+            placed.update(wave)
+        return waves
+
+    def _should_repair(self, job: dict) -> bool:
+        """
+        False for a file the journal gave up on (unchanged since) or that has used up its
+        attempts; the latter is marked gave_up.
+        """
+        target, sources = job["target"], job["sources"]
+        if self.journal.state(target) == "gave_up":
+            if self.journal.settled(target, sources):
+                return False
+        elif self.journal.attempts(target) >= self.max_retries:
+            self._mark(target, "gave_up", sources)
+            return False
+        return True
+
+    def repair_from_build(self, mapping: MappingLoader, max_rounds=None) -> dict:
+        """
+        Build-driven repair: build once, route the errors to the files they name, fix only
+        those files in dependency waves (a file's dependencies are fixed before its own
+        prompt is built), and rebuild.
+        Stops when the build is clean or the error count stops shrinking.
+        Falls back to retry_fixes over the whole mapping when Gradle is unavailable (no
+        Gradle on PATH and only the placeholder wrapper) or when a failing build reports no
+        error that can be tied to a migrated file.
+        """
+        if self.validator.gradle_cmd is None:
+            print("⚠️ No Gradle build available; checking every mapped target instead")
+            return self.retry_fixes(mapping)
+        if not mapping.get_all_mappings():
+            mapping.load()
+        sources_by_target = {os.path.normpath(t): mapping.get_sources_for_target(t) for t in mapping.target_to_source}
+
+        max_rounds = max_rounds or self.max_retries
+        previous_errors = None
+        rounds, dispatched, results = 0, 0, []
+        build = self.validator.validate_build()
+
+        while not build["build_success"] and rounds < max_rounds:
+            errors = build["errors"]
+            if previous_errors is not None and len(errors) >= previous_errors:
+                print(f"🛑 Error count did not shrink ({previous_errors} → {len(errors)}); stopping")
+                break
+            previous_errors = len(errors)
+            rounds += 1
+
+            # Missing libraries are fixed in build.gradle, not in the files that import them
+            gradle_fix = self.build_fixer.fix(diagnostics=errors)
+            by_file, unrouted = self._route_diagnostics(errors)
+            print(f"🧭 Round {rounds}: {len(errors)} errors in {len(by_file)} files ({len(unrouted)} not tied to a migrated file)")
+            if not by_file and gradle_fix["status"] != "fixed":
+                # The build gives no file to start from; check every mapped target on its own instead
+                print("⚠️ Build failure is not tied to any migrated file; checking every mapped target instead")
+                fallback = self.retry_fixes(mapping)
+                fallback.update(
+                    rounds=rounds,
+                    retry_attempts=dispatched + fallback["retry_attempts"],
+                    remaining_errors=errors,
+                    results=results + fallback["results"]
+                )
+                return fallback
+
+            jobs, gave_up = [], []
+            for rel_path, diagnostics in by_file.items():
+                job = {"target": rel_path, "sources": sources_by_target.get(os.path.normpath(rel_path), []), "diagnostics": diagnostics}
+                if self.journal and not self._should_repair(job):
+                    gave_up.append({"target": rel_path, "status": "gave_up", "errors": len(diagnostics), "round": rounds})
+                    continue
+                job["attempt"] = self.journal.attempts(rel_path) + 1 if self.journal else rounds
+                jobs.append(job)
+            if gave_up:
+                print(f"🪦 Skipping {len(gave_up)} files already given up on after {self.max_retries} attempts")
+                results.extend(gave_up)
+            if not jobs and gradle_fix["status"] != "fixed":
+                break
+
+            dispatched += len(jobs)
+
+            # Dependencies are fixed (and written) before the files that use them build their prompts
+            round_results = []
+            with span("repair.round", round=rounds, errors=len(errors), files=len(jobs)):
+                for wave in self._repair_waves(jobs):
+                    if self.workers == 1 or len(wave) <= 1:
+                        round_results.extend(self._repair_file(job) for job in wave)
+                    else:
+                        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="repair") as pool:
+                            round_results.extend(pool.map(self._repair_file, wave))
+            results.extend(dict(r, round=rounds) for r in round_results)
+
+            build = self.validator.validate_build()
+
+        failed_targets = sorted(self._route_diagnostics(build["errors"])[0])
+        if self.journal:
+            # Files the last build still flags were not really fixed
+            for rel_path in failed_targets:
+                if self.journal.state(rel_path) == "fixed":
+                    self._mark(rel_path, "pending", sources_by_target.get(os.path.normpath(rel_path), []))
+        print(f"🏁 Build {'succeeded' if build['build_success'] else 'still fails'} after {rounds} repair rounds ({dispatched} file fixes)")
+        return {
+            "status": "success" if build["build_success"] else "failed",
+            "retry_attempts": dispatched,
+            "rounds": rounds,
+            "failed_targets": failed_targets,
+            "remaining_errors": build["errors"],
+            "results": results
+        }
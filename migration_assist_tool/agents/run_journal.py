@@ -0,0 +1,233 @@
+# agents/run_journal.py
+
+import os
+import json
+import glob
+import time
+import uuid
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+JOURNAL_DIR = os.path.join("logs", "runs")
+
+# pending -> compiling -> fixed | pending (retry later) | gave_up
+TARGET_STATES = ("pending", "compiling", "fixed", "gave_up")
+SETTLED_STATES = ("fixed", "gave_up")
+
+
+def file_hash(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def new_run_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def _run_inputs(legacy: str, migrated: str, map_path: str, reference: str = "", enterprise: str = "") -> dict:
+    return {
+        "legacy": os.path.abspath(legacy),
+        "migrated": os.path.abspath(migrated),
+        "map": os.path.abspath(map_path),
+        "reference": os.path.abspath(reference) if reference else "",
+        "enterprise": os.path.abspath(enterprise) if enterprise else ""
+    }
+
+
+def read_run_inputs(run_id: str, journal_dir: str = JOURNAL_DIR) -> dict:
+    """
+    The inputs a run was started with, so `--resume <run-id>` needs no other arguments.
+    """
+    path = os.path.join(journal_dir, f"{run_id}.jsonl")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No run journal for '{run_id}' in {journal_dir}")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.loads(f.readline())["inputs"]
+
+
+def find_resumable_run(inputs: dict, journal_dir: str = JOURNAL_DIR) -> Optional[str]:
+    """
+    The most recent unfinished run over the same legacy/migrated/mapping paths, if any.
+    """
+    for path in sorted(glob.glob(os.path.join(journal_dir, "*.jsonl")), key=os.path.getmtime, reverse=True):
+        journal = RunJournal(path)
+        if not journal.finished and journal.inputs and all(journal.inputs.get(k) == inputs[k] for k in ("legacy", "migrated", "map")):
+            return journal.run_id
+    return None
+
+
+def open_run(legacy: str, migrated: str, map_path: str, reference: str = "", enterprise: str = "",
+             run_id: str = "", fresh: bool = False, journal_dir: str = JOURNAL_DIR) -> "RunJournal":
+    """
+    Opens the journal for this run: `run_id` if given, otherwise the latest unfinished run
+    over the same inputs (unless `fresh`), otherwise a new run.
+    """
+    inputs = _run_inputs(legacy, migrated, map_path, reference, enterprise)
+    if not run_id and not fresh:
+        run_id = find_resumable_run(inputs, journal_dir) or ""
+    path = os.path.join(journal_dir, f"{run_id or new_run_id()}.jsonl")
+    if run_id and not os.path.exists(path):
+        raise FileNotFoundError(f"No run journal for '{run_id}' in {journal_dir}")
+    journal = RunJournal(path)
+    journal.start(inputs)
+    return journal
+
+
+class RunJournal:
+    """
+    Append-only JSON-lines journal of one migration run: the stages it completed and the
+    state of every target it touched, with the content hashes of the target and its
+    legacy sources at that point.
+
+    Every event is flushed and fsynced before the work it describes moves on, so after a
+    crash or Ctrl-C replaying the file gives the last known state. A settled target
+    (fixed or gave up) is only trusted while its files still hash the same; otherwise
+    it is treated as new work.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.run_id = os.path.splitext(os.path.basename(path))[0]
+        self.inputs: dict = {}
+        self.mapping_hash: Optional[str] = None
+        self.stages: Dict[str, str] = {}
+        self.targets: Dict[str, dict] = {}
+        self.finished: Optional[str] = None
+        self.starts = 0
+
+        self._file = None
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._replay()
+
+    def _replay(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write
+                    continue
+                kind = event.get("event")
+                if kind == "start":
+                    self.starts += 1
+                    self.inputs = event["inputs"]
+                    self.mapping_hash = event.get("mapping_hash")
+                    self.finished = None
+                elif kind == "stage":
+                    self.stages[event["stage"]] = event["state"]
+                elif kind == "target":
+                    self.targets[event["target"]] = event
+                elif kind == "finish":
+                    self.finished = event["status"]
+
+    def _append(self, event: dict):
+        event["ts"] = datetime.utcnow().isoformat()
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps(event) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def start(self, inputs: dict):
+        """
+        Records a (re)start and reports what a resumed run inherits or must redo.
+        """
+        mapping_hash = file_hash(inputs["map"])
+        if self.starts:
+            interrupted = sum(1 for t in self.targets.values() if t["state"] == "compiling")
+            settled = sum(1 for t in self.targets.values() if t["state"] in SETTLED_STATES)
+            print(f"♻️ Resuming run {self.run_id}: {settled} targets settled, {interrupted} interrupted mid-fix")
+            if self.mapping_hash != mapping_hash:
+                print("⚠️ Mapping file changed since this run started; targets are re-planned from the new mapping")
+            changed = [k for k in ("legacy", "migrated", "map") if self.inputs.get(k) != inputs[k]]
+            if changed:
+                print(f"⚠️ Resuming with different inputs ({', '.join(changed)}); settled targets are re-verified by hash")
+        else:
+            print(f"📓 Run {self.run_id} journaled to {self.path}")
+        self.inputs = inputs
+        self.mapping_hash = mapping_hash
+        self.finished = None
+        self.starts += 1
+        self._append({"event": "start", "run_id": self.run_id, "inputs": inputs, "mapping_hash": mapping_hash})
+
+    def stage_done(self, stage: str) -> bool:
+        return self.stages.get(stage) == "done"
+
+    def mark_stage(self, stage: str, state: str = "done"):
+        self.stages[stage] = state
+        self._append({"event": "stage", "stage": stage, "state": state})
+
+    def _hashes(self, target: str, sources: List[str]) -> tuple:
+        target_hash = file_hash(os.path.join(self.inputs["migrated"], target))
+        source_hashes = {source: file_hash(os.path.join(self.inputs["legacy"], source)) for source in sources}
+        return target_hash, source_hashes
+
+    def attempts(self, target: str) -> int:
+        record = self.targets.get(os.path.normpath(target))
+        return record["attempts"] if record else 0
+
+    def state(self, target: str) -> str:
+        record = self.targets.get(os.path.normpath(target))
+        return record["state"] if record else "pending"
+
+    def mark(self, target: str, state: str, sources: List[str] = (), attempts: Optional[int] = None):
+        """
+        Records `target`'s new state with the current hashes of it and its sources.
+        `attempts` is cumulative across restarts; omit it to keep the previous count.
+        """
+        key = os.path.normpath(target)
+        target_hash, source_hashes = self._hashes(target, list(sources))
+        event = {
+            "event": "target",
+            "target": key,
+            "state": state,
+            "attempts": self.attempts(key) if attempts is None else attempts,
+            "hash": target_hash,
+            "sources": source_hashes
+        }
+        with self._lock:
+            self.targets[key] = event
+        self._append(dict(event))
+
+    def settled(self, target: str, sources: List[str] = ()) -> bool:
+        """
+        True when `target` was fixed or given up on and neither it nor its sources have
+        changed since. A changed target goes back to pending with its attempts reset.
+        """
+        key = os.path.normpath(target)
+        record = self.targets.get(key)
+        if not record or record["state"] not in SETTLED_STATES:
+            return False
+        target_hash, source_hashes = self._hashes(target, list(sources))
+        if target_hash == record["hash"] and source_hashes == record["sources"]:
+            return True
+        print(f"🔄 {target} changed since it was marked {record['state']}; queuing it again")
+        self.mark(target, "pending", sources, attempts=0)
+        return False
+
+    def summary(self) -> dict:
+        counts = {state: 0 for state in TARGET_STATES}
+        for record in self.targets.values():
+            counts[record["state"]] = counts.get(record["state"], 0) + 1
+        return counts
+
+    def finish(self, status: str):
+        self.finished = status
+        self._append({"event": "finish", "status": status, "targets": self.summary()})
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
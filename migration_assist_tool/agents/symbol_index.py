@@ -0,0 +1,179 @@
+# agents/symbol_index.py
+
+import os
+import json
+import hashlib
+import threading
+from typing import Dict, List, Optional
+from agents.java_parser import parse_java
+from utils.file_cache import read_text
+
+INDEX_VERSION = 2
+
+_shared_indexes: Dict[str, "JavaSymbolIndex"] = {}
+_shared_lock = threading.Lock()
+
+
+def get_symbol_index(migrated_dir: str) -> "JavaSymbolIndex":
+    """
+    Returns the process-wide symbol index for migrated_dir, creating it on first use.
+    """
+    key = os.path.abspath(migrated_dir)
+    with _shared_lock:
+        index = _shared_indexes.get(key)
+        if index is None:
+            index = JavaSymbolIndex(migrated_dir)
+            _shared_indexes[key] = index
+        return index
+
+
+class JavaSymbolIndex:
+    """
+    Class name -> {path, package, public methods, method signatures, fields} for every .java file under migrated_dir.
+
+    Built in one directory pass on first lookup and persisted between runs; files whose
+    (size, mtime_ns) are unchanged since the last run are not re-parsed. Agents that write
+    a migrated file call update_file() so lookups stay current within a run.
+    """
+
+    def __init__(self, migrated_dir: str, cache_path: Optional[str] = None):
+        self.migrated_dir = migrated_dir
+        if cache_path is None:
+            digest = hashlib.md5(os.path.abspath(migrated_dir).encode("utf-8")).hexdigest()[:10]
+            cache_path = os.path.join("data", f"symbol_index_{digest}.json")
+        self.cache_path = cache_path
+
+        self.files: Dict[str, dict] = {}
+        self.classes: Dict[str, List[dict]] = {}
+        self._lock = threading.RLock()
+        self._built = False
+
+    def _parse(self, code: str) -> List[dict]:
+        parsed = parse_java(code)
+        classes = []
+        for index, decl in enumerate(parsed["types"]):
+            methods = [
+                m for m in parsed["methods"]
+                if m["type_index"] == index and m["name"] != decl["name"]
+            ]
+            classes.append({
+                "name": decl["name"],
+                "package": parsed["package"],
+                "methods": list(dict.fromkeys(m["name"] for m in methods if "public" in m["modifiers"] or decl["kind"] == "interface")),
+                "signatures": [
+                    {"name": m["name"], "params": m["param_types"], "returns": m["return_type"]}
+                    for m in methods
+                ],
+                "fields": [
+                    {"type": f["type"], "name": f["name"]}
+                    for f in parsed["fields"] if f["type_index"] == index
+                ]
+            })
+        return classes
+
+    def _load_cache(self) -> Dict[str, dict]:
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("version") == INDEX_VERSION:
+                return cached.get("files", {})
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable symbol index {self.cache_path}: {e}")
+        return {}
+
+    def save(self):
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "files": self.files}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.cache_path)
+
+    def build(self):
+        with self._lock:
+            cached = self._load_cache()
+            files = {}
+            parsed = 0
+            stack = [self.migrated_dir]
+            while stack:
+                directory = stack.pop()
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                                continue
+                            if not entry.name.endswith(".java"):
+                                continue
+                            rel_path = os.path.relpath(entry.path, self.migrated_dir)
+                            stat = entry.stat()
+                            record = cached.get(rel_path)
+                            if record and record["size"] == stat.st_size and record["mtime_ns"] == stat.st_mtime_ns:
+                                files[rel_path] = record
+                                continue
+                            files[rel_path] = self._parse_file(entry.path, stat)
+                            parsed += 1
+                except OSError as e:
+                    print(f"⚠️ Cannot scan {directory}: {e}")
+
+            self.files = files
+            self._rebuild_classes()
+            self._built = True
+            if parsed or len(files) != len(cached):
+                self.save()
+
+    def _parse_file(self, full_path: str, stat: os.stat_result) -> dict:
+        try:
+            classes = self._parse(read_text(full_path))
+        except Exception as e:
+            print(f"⚠️ Could not index {full_path}: {e}")
+            classes = []
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "classes": classes}
+
+    def _rebuild_classes(self):
+        classes = {}
+        for rel_path in sorted(self.files):
+            for cls in self.files[rel_path]["classes"]:
+                classes.setdefault(cls["name"], []).append({**cls, "path": rel_path})
+        self.classes = classes
+
+    def _ensure_built(self):
+        if not self._built:
+            self.build()
+
+    def update_file(self, rel_path: str):
+        """
+        Re-indexes one migrated file after it has been written (or drops it if it is gone).
+        """
+        self._ensure_built()
+        full_path = os.path.join(self.migrated_dir, rel_path)
+        rel_path = os.path.relpath(full_path, self.migrated_dir)
+        with self._lock:
+            old_names = {cls["name"] for cls in self.files.get(rel_path, {}).get("classes", [])}
+            if os.path.exists(full_path):
+                self.files[rel_path] = self._parse_file(full_path, os.stat(full_path))
+            else:
+                self.files.pop(rel_path, None)
+
+            new_classes = self.files.get(rel_path, {}).get("classes", [])
+            for name in old_names | {cls["name"] for cls in new_classes}:
+                entries = [e for e in self.classes.get(name, []) if e["path"] != rel_path]
+                entries.extend({**cls, "path": rel_path} for cls in new_classes if cls["name"] == name)
+                entries.sort(key=lambda e: e["path"])
+                if entries:
+                    self.classes[name] = entries
+                else:
+                    self.classes.pop(name, None)
+
+    def get_class(self, class_name: str) -> Optional[dict]:
+        self._ensure_built()
+        entries = self.classes.get(class_name)
+        return entries[0] if entries else None
+
+    def find_class(self, class_name: str) -> Optional[str]:
+        entry = self.get_class(class_name)
+        return entry["path"] if entry else None
@@ -0,0 +1,106 @@
+// tools/CompileServer.java
+//
+// Long-lived compile server driven by agents/compile_service.py. One warm JVM runs every
+// compile through javax.tools.JavaCompiler, so checks skip JVM start-up and javac warm-up.
+// Launch with the JDK source launcher: java tools/CompileServer.java
+//
+// Protocol (UTF-8 lines on stdin/stdout):
+//   server -> READY                      once the compiler is loaded
+//   client -> BEGIN                      start a request
+//   client -> OPT <javac option>         zero or more, in order (e.g. "OPT -d", "OPT /tmp/out")
+//   client -> FILE <path>                one or more source files
+//   client -> END                        compile the request
+//   server -> DIAG <kind>\t<file>\t<line>\t<column>\t<code>\t<message>   per diagnostic
+//   server -> RESULT <ok|fail> <millis>
+//   client -> QUIT                       shut down
+// Fields are escaped: backslash, tab and newline become \\, \t and \n.
+
+import javax.tools.Diagnostic;
+import javax.tools.DiagnosticCollector;
+import javax.tools.JavaCompiler;
+import javax.tools.JavaFileObject;
+import javax.tools.StandardJavaFileManager;
+import javax.tools.ToolProvider;
+import java.io.BufferedReader;
+import java.io.File;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.io.StringWriter;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.List;
+import java.util.Locale;
+
+public class CompileServer {
+
+    public static void main(String[] args) throws IOException {
+        PrintStream out = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+        // Anything the compiler writes to System.out must not corrupt the protocol stream
+        System.setOut(System.err);
+
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+        if (compiler == null) {
+            out.println("ERROR no system Java compiler; a JDK is required");
+            return;
+        }
+        StandardJavaFileManager fileManager = compiler.getStandardFileManager(null, Locale.ROOT, StandardCharsets.UTF_8);
+        BufferedReader in = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        out.println("READY");
+
+        List<String> options = new ArrayList<>();
+        List<File> files = new ArrayList<>();
+        String line;
+        while ((line = in.readLine()) != null) {
+            if (line.equals("BEGIN")) {
+                options.clear();
+                files.clear();
+            } else if (line.startsWith("OPT ")) {
+                options.add(line.substring(4));
+            } else if (line.startsWith("FILE ")) {
+                files.add(new File(line.substring(5)));
+            } else if (line.equals("END")) {
+                compile(compiler, fileManager, options, files, out);
+            } else if (line.equals("QUIT")) {
+                break;
+            }
+        }
+        fileManager.close();
+    }
+
+    private static void compile(JavaCompiler compiler, StandardJavaFileManager fileManager,
+                                List<String> options, List<File> files, PrintStream out) {
+        long start = System.nanoTime();
+        DiagnosticCollector<JavaFileObject> diagnostics = new DiagnosticCollector<>();
+        StringWriter extra = new StringWriter();
+        boolean ok;
+        try {
+            Iterable<? extends JavaFileObject> units = fileManager.getJavaFileObjectsFromFiles(files);
+            ok = compiler.getTask(extra, fileManager, diagnostics, options, null, units).call();
+            fileManager.flush();
+        } catch (RuntimeException | IOException e) {
+            ok = false;
+            out.println("DIAG ERROR\t\t0\t0\t\t" + escape(String.valueOf(e)));
+        }
+
+        for (Diagnostic<? extends JavaFileObject> d : diagnostics.getDiagnostics()) {
+            String file = d.getSource() == null ? "" : d.getSource().getName();
+            out.println("DIAG " + d.getKind() + "\t" + escape(file) + "\t" + d.getLineNumber() + "\t"
+                    + d.getColumnNumber() + "\t" + escape(String.valueOf(d.getCode())) + "\t"
+                    + escape(d.getMessage(Locale.ROOT)));
+        }
+        if (extra.getBuffer().length() > 0) {
+            // Option errors and notes that are not attached to a source file
+            out.println("DIAG NOTE\t\t0\t0\t\t" + escape(extra.toString().trim()));
+        }
+        long millis = (System.nanoTime() - start) / 1_000_000;
+        out.println("RESULT " + (ok ? "ok" : "fail") + " " + millis);
+        out.flush();
+    }
+
+    private static String escape(String value) {
+        return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "");
+    }
+}
@@ -0,0 +1,105 @@
+# utils/file_cache.py
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+from utils.tracing import span
+
+_shared_cache: Optional["FileCache"] = None
+_shared_lock = threading.Lock()
+
+
+def get_file_cache() -> "FileCache":
+    """
+    Returns the process-wide file content cache (capped at FILE_CACHE_MAX_MB).
+    """
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = FileCache()
+        return _shared_cache
+
+
+def read_text(path: str, encoding: str = "utf-8", errors: str = "strict") -> str:
+    return get_file_cache().read_text(path, encoding, errors)
+
+
+def write_text(path: str, text: str, encoding: str = "utf-8"):
+    get_file_cache().write_text(path, text, encoding)
+
+
+def invalidate(path: str):
+    get_file_cache().invalidate(path)
+
+
+class FileCache:
+    """
+    Decoded contents of source files, keyed by absolute path.
+
+    Every read stats the file and serves the cached text only while (size, mtime_ns) still
+    match, so edits made by other processes are picked up. Writes through write_text
+    refresh the entry directly. Entries are evicted least-recently-used once the cached
+    files exceed `max_bytes` (on-disk size).
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes or int(float(os.getenv("FILE_CACHE_MAX_MB", "256")) * 1024 * 1024)
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # path -> (size, mtime_ns, encoding, errors, text)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _store(self, key: str, stat: os.stat_result, encoding: str, errors: str, text: str):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= old[0]
+            if stat.st_size > self.max_bytes:
+                return
+            self._entries[key] = (stat.st_size, stat.st_mtime_ns, encoding, errors, text)
+            self._bytes += stat.st_size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[0]
+                self.stats["evictions"] += 1
+
+    def read_text(self, path: str, encoding: str = "utf-8", errors: str = "strict") -> str:
+        """
+        Same result as reading the file with open(); raises the same errors if it is missing.
+        """
+        key = os.path.abspath(path)
+        stat = os.stat(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[:4] == (stat.st_size, stat.st_mtime_ns, encoding, errors):
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[4]
+            self.stats["misses"] += 1
+
+        with open(key, "r", encoding=encoding, errors=errors) as f:
+            text = f.read()
+        # Stat again after reading: a write racing with the read must not be cached as current
+        if os.stat(key).st_mtime_ns == stat.st_mtime_ns:
+            self._store(key, stat, encoding, errors, text)
+        return text
+
+    def write_text(self, path: str, text: str, encoding: str = "utf-8"):
+        key = os.path.abspath(path)
+        with span("disk.write", path=path, chars=len(text)):
+            with open(key, "w", encoding=encoding) as f:
+                f.write(text)
+        # Text-mode writes may translate newlines, so only the exact on-disk form is cached
+        if os.linesep == "\n":
+            self._store(key, os.stat(key), encoding, "strict", text)
+        else:
+            self.invalidate(key)
+
+    def invalidate(self, path: str):
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._bytes -= entry[0]
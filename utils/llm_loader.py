@@ -1,47 +1,268 @@
 # utils/llm_loader.py
 
 import os
+import re
+import random
+import asyncio
+import hashlib
+import threading
+from typing import Dict, List, Optional
+import numpy as np
 from dotenv import load_dotenv
+from utils.rate_limiter import RateLimiter
+from utils.tracing import span
 
-# OpenAI SDK
-from openai import OpenAI
+load_dotenv()
 
-# Azure OpenAI via LangChain
-from langchain.chat_models import AzureChatOpenAI
-from langchain.embeddings import AzureOpenAIEmbeddings
+RETRYABLE_STATUS = {408, 409, 429}
+RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError", "TimeoutError")
 
-load_dotenv()
+_shared_clients: Dict[str, "LLMClient"] = {}
+_shared_lock = threading.Lock()
+
+
+def _provider_name() -> str:
+    return os.getenv("LLM_PROVIDER", "openai").lower()
 
-def get_llm():
+
+def get_llm_model() -> str:
     """
-    Returns the appropriate chat LLM client (AzureChatOpenAI or OpenAI).
+    Returns the model (or Azure deployment) name that get_llm() talks to.
     """
-    provider = os.getenv("LLM_PROVIDER", "openai").lower()
+    provider = _provider_name()
 
     if provider == "azure":
-        return AzureChatOpenAI(
-            openai_api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            openai_api_base=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            openai_api_version=os.getenv("AZURE_API_VERSION", "2024-02-15-preview"),
-            deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
-            openai_api_type="azure",
-            temperature=0.2
+        return os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "")
+    if provider == "fake":
+        return "fake"
+    return os.getenv("OPENAI_MODEL", "gpt-4o")
+
+
+def get_llm() -> "LLMClient":
+    """
+    Returns the process-wide LLM client for LLM_PROVIDER (openai, azure or fake).
+    """
+    provider = _provider_name()
+    with _shared_lock:
+        client = _shared_clients.get(provider)
+        if client is None:
+            client = LLMClient(provider)
+            _shared_clients[provider] = client
+        return client
+
+
+def get_embedding_client() -> "LLMClient":
+    """
+    Returns the embedding client; chat and embeddings share one client and connection pool.
+    """
+    return get_llm()
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return isinstance(error, asyncio.TimeoutError) or type(error).__name__ in RETRYABLE_ERRORS
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class OpenAIProvider:
+    """
+    OpenAI / Azure OpenAI over the async SDK. SDK-level retries are disabled because
+    LLMClient retries with its own jittered backoff and rate limiting.
+    """
+
+    def __init__(self, provider: str, pool_size: int):
+        import httpx
+        from openai import AsyncOpenAI, AsyncAzureOpenAI, DefaultAsyncHttpxClient
+
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
         )
-    else:
-        return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        if provider == "azure":
+            self.client = AsyncAzureOpenAI(
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                api_version=os.getenv("AZURE_API_VERSION", "2024-02-15-preview"),
+                http_client=http_client,
+                max_retries=0
+            )
+        else:
+            self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=http_client, max_retries=0)
 
-def get_embedding_client():
+    async def chat(self, model: str, messages: List[dict], temperature: float, max_tokens: Optional[int]) -> str:
+        params = {"max_tokens": max_tokens} if max_tokens else {}
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            **params
+        )
+        return response.choices[0].message.content or ""
+
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        response = await self.client.embeddings.create(model=model, input=texts)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+class FakeProvider:
     """
-    Returns the embedding client (AzureOpenAIEmbeddings or OpenAI).
+    Offline provider for local runs and load tests. Chat requests that carry a
+    'MIGRATED FILE:' section get that file back unchanged; other prompts get the first
+    method name they mention. Embeddings are deterministic hashed bag-of-words vectors,
+    so similar code still lands near each other. FAKE_LLM_LATENCY_MS adds simulated latency.
     """
-    provider = os.getenv("LLM_PROVIDER", "openai").lower()
 
-    if provider == "azure":
-        return AzureOpenAIEmbeddings(
-            deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
-            openai_api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            openai_api_base=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            openai_api_version=os.getenv("AZURE_API_VERSION", "2024-02-15-preview"),
+    def __init__(self, latency: float = 0.0, dim: int = 256):
+        self.latency = latency
+        self.dim = dim
+
+    async def chat(self, model: str, messages: List[dict], temperature: float, max_tokens: Optional[int]) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        prompt = messages[-1]["content"] if messages else ""
+        if "MIGRATED FILE:" in prompt:
+            return prompt.rsplit("MIGRATED FILE:", 1)[1].strip()
+        match = re.search(r'(\w+)\(', prompt)
+        return match.group(1) if match else ""
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r'\w+', text.lower()):
+            digest = int(hashlib.md5(word.encode("utf-8")).hexdigest()[:8], 16)
+            vector[digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        else:
+            vector[0] = 1.0
+        return vector.tolist()
+
+    async def embed(self, model: str, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+
+class LLMClient:
+    """
+    Unified chat + embedding client shared by every agent.
+
+    The async API (acomplete / aembed) throttles each request through a token-bucket
+    limiter (LLM_RPM / LLM_TPM for chat, EMBED_RPM / EMBED_TPM for embeddings), applies a
+    per-call timeout (LLM_TIMEOUT seconds) and retries 429, 5xx, timeout and connection
+    errors with jittered exponential backoff (LLM_MAX_RETRIES). Requests share one pooled
+    HTTP connection set per event loop.
+
+    The sync facade (complete / embed_documents / embed_query) runs those coroutines on a
+    background event loop, so threads can share the client and their requests overlap.
+    """
+
+    def __init__(self, provider: str = "openai"):
+        self.provider = provider
+        self.model = get_llm_model()
+        if provider == "azure":
+            self.embedding_model = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", ""))
+        else:
+            self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+
+        self.timeout = float(os.getenv("LLM_TIMEOUT", "120"))
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "5"))
+        self.pool_size = int(os.getenv("LLM_POOL_SIZE", "32"))
+        self.chat_limiter = RateLimiter(rpm=int(os.getenv("LLM_RPM", "0")), tpm=int(os.getenv("LLM_TPM", "0")))
+        self.embed_limiter = RateLimiter(rpm=int(os.getenv("EMBED_RPM", "0")), tpm=int(os.getenv("EMBED_TPM", "0")))
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+
+        self._providers = {}
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _provider_for_loop(self):
+        # HTTP connection pools are bound to the event loop that created them
+        loop = asyncio.get_running_loop()
+        provider = self._providers.get(loop)
+        if provider is None:
+            if self.provider == "fake":
+                provider = FakeProvider(latency=float(os.getenv("FAKE_LLM_LATENCY_MS", "0")) / 1000.0)
+            else:
+                provider = OpenAIProvider(self.provider, self.pool_size)
+            self._providers[loop] = provider
+        return provider
+
+    async def _call(self, limiter: RateLimiter, tokens: int, request, timeout: Optional[float]):
+        timeout = timeout or self.timeout
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire_async(tokens)
+            self.stats["requests"] += 1
+            try:
+                return await asyncio.wait_for(request(), timeout)
+            except Exception as e:
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    self.stats["failures"] += 1
+                    raise
+                # Full jitter keeps workers that failed together from retrying together
+                delay = _retry_after(e) or random.uniform(0, min(60.0, 2.0 ** attempt))
+                self.stats["retries"] += 1
+                print(f"⏳ LLM request failed ({type(e).__name__}: {_status_code(e) or e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def acomplete(self, messages: List[dict], temperature: float = 0.2, max_tokens: Optional[int] = None,
+                        model: Optional[str] = None, timeout: Optional[float] = None) -> str:
+        provider = self._provider_for_loop()
+        # Rough token estimate for the TPM budget: ~4 characters per token plus the completion allowance
+        tokens = sum(len(m.get("content") or "") for m in messages) // 4 + (max_tokens or 0)
+        return await self._call(
+            self.chat_limiter, tokens,
+            lambda: provider.chat(model or self.model, messages, temperature, max_tokens),
+            timeout
         )
-    else:
-        return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    async def aembed(self, texts: List[str], model: Optional[str] = None, tokens: Optional[int] = None,
+                     timeout: Optional[float] = None) -> List[List[float]]:
+        if not texts:
+            return []
+        provider = self._provider_for_loop()
+        if tokens is None:
+            tokens = sum(len(text) for text in texts) // 4
+        return await self._call(
+            self.embed_limiter, tokens,
+            lambda: provider.embed(model or self.embedding_model, texts),
+            timeout
+        )
+
+    def _run(self, coroutine):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def complete(self, messages: List[dict], temperature: float = 0.2, max_tokens: Optional[int] = None,
+                 model: Optional[str] = None, timeout: Optional[float] = None) -> str:
+        tokens_in = sum(len(m.get("content") or "") for m in messages) // 4
+        with span("llm.chat", model=model or self.model, tokens_in=tokens_in) as attrs:
+            response = self._run(self.acomplete(messages, temperature, max_tokens, model, timeout))
+            attrs["tokens_out"] = len(response) // 4
+            return response
+
+    def embed_documents(self, texts: List[str], model: Optional[str] = None, tokens: Optional[int] = None) -> List[List[float]]:
+        with span("llm.embed", model=model or self.embedding_model, texts=len(texts),
+                  tokens_in=tokens if tokens is not None else sum(len(t) for t in texts) // 4):
+            return self._run(self.aembed(texts, model, tokens))
+
+    def embed_query(self, text: str, model: Optional[str] = None) -> List[float]:
+        return self.embed_documents([text], model)[0]
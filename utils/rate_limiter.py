@@ -0,0 +1,71 @@
+# utils/rate_limiter.py
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """
+    Thread-safe token-bucket limiter for requests-per-minute and tokens-per-minute quotas.
+    A limit of None (or 0) disables that bucket.
+    """
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        self.rpm = rpm or None
+        self.tpm = tpm or None
+        self._lock = threading.Lock()
+        self._requests = float(self.rpm or 0)
+        self._tokens = float(self.tpm or 0)
+        self._last = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self._last
+        self._last = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60.0)
+
+    def reserve(self, tokens: int = 0) -> float:
+        """
+        Takes one request and `tokens` tokens if both are available and returns 0.
+        Otherwise takes nothing and returns how many seconds to wait before retrying.
+        """
+        # A single request larger than the whole per-minute budget waits for a full bucket
+        if self.tpm:
+            tokens = min(tokens, self.tpm)
+
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = 0.0
+            if self.rpm and self._requests < 1:
+                wait = max(wait, (1 - self._requests) * 60.0 / self.rpm)
+            if self.tpm and self._tokens < tokens:
+                wait = max(wait, (tokens - self._tokens) * 60.0 / self.tpm)
+            if wait > 0:
+                return wait
+
+            if self.rpm:
+                self._requests -= 1
+            if self.tpm:
+                self._tokens -= tokens
+            return 0.0
+
+    def acquire(self, tokens: int = 0):
+        while True:
+            wait = self.reserve(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        """
+        Same as acquire() but yields to the event loop while waiting.
+        """
+        while True:
+            wait = self.reserve(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
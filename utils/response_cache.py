@@ -0,0 +1,175 @@
+# utils/response_cache.py
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Callable, Dict, List, Optional
+from utils.tracing import span
+
+MODES = ("readwrite", "readonly", "bypass")
+
+_shared_caches: Dict[str, "ResponseCache"] = {}
+_shared_lock = threading.Lock()
+
+
+def get_response_cache(path: Optional[str] = None) -> "ResponseCache":
+    """
+    Returns the process-wide response cache for `path` (LLM_CACHE_PATH by default).
+    """
+    path = path or os.getenv("LLM_CACHE_PATH", os.path.join("data", "llm_cache.sqlite"))
+    key = os.path.abspath(path)
+    with _shared_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = ResponseCache(path)
+            _shared_caches[key] = cache
+        return cache
+
+
+class ResponseCache:
+    """
+    Content-addressed cache of LLM chat responses in a local SQLite file.
+
+    Entries are keyed by sha256 of (model, temperature, messages, extra request params),
+    so an identical prompt on a re-run is answered locally. Entries older than
+    `max_age_days` are dropped, and the least recently used ones are evicted once the
+    stored responses exceed `max_bytes`.
+
+    Modes (LLM_CACHE_MODE): "readwrite" (default), "readonly" serves hits but never
+    writes to the file (it is opened read-only and a missing one counts as empty),
+    "bypass" neither reads nor writes.
+    """
+
+    def __init__(self, path: str, mode: Optional[str] = None, max_bytes: Optional[int] = None, max_age_days: Optional[float] = None):
+        self.path = path
+        self.mode = (mode or os.getenv("LLM_CACHE_MODE", "readwrite")).lower()
+        if self.mode not in MODES:
+            print(f"⚠️ Unknown LLM_CACHE_MODE '{self.mode}', using readwrite")
+            self.mode = "readwrite"
+        self.max_bytes = max_bytes or int(float(os.getenv("LLM_CACHE_MAX_MB", "512")) * 1024 * 1024)
+        self.max_age = (max_age_days or float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30"))) * 86400
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._puts_since_evict = 0
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and self.mode == "readonly":
+            # Never create, migrate or evict someone else's cache; a missing file is an empty cache
+            if not os.path.exists(self.path):
+                return None
+            uri = "file:" + os.path.abspath(self.path).replace("%", "%25").replace("?", "%3f").replace("#", "%23") + "?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=30)
+        elif self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+            conn.commit()
+            self._conn = conn
+            self._evict()
+        return self._conn
+
+    @staticmethod
+    def key(model: str, temperature: float, messages: List[dict], **params) -> str:
+        payload = json.dumps(
+            {"model": model, "temperature": temperature, "messages": messages, "params": params},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, temperature: float, messages: List[dict], **params) -> Optional[str]:
+        if self.mode == "bypass":
+            return None
+        key = self.key(model, temperature, messages, **params)
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT response, created FROM responses WHERE key = ?", (key,)
+                ).fetchone() if conn is not None else None
+            except sqlite3.OperationalError:
+                # A read-only cache file without the responses table yet
+                if self.mode != "readonly":
+                    raise
+                row = None
+            if row is None or time.time() - row[1] > self.max_age:
+                self.stats["misses"] += 1
+                return None
+            if self.mode == "readwrite":
+                conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, model: str, temperature: float, messages: List[dict], response: str, **params):
+        if self.mode != "readwrite":
+            return
+        key = self.key(model, temperature, messages, **params)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode("utf-8")), now, now)
+            )
+            conn.commit()
+            self.stats["stores"] += 1
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= 100:
+                self._evict()
+
+    def get_or_call(self, model: str, temperature: float, messages: List[dict], call: Callable[[], str], **params) -> str:
+        """
+        Returns the cached response for this request, or runs `call()` and caches what it returns.
+        """
+        with span("llm.request", model=model) as attrs:
+            cached = self.get(model, temperature, messages, **params)
+            attrs["cache_hit"] = cached is not None
+            if cached is not None:
+                return cached
+            response = call()
+            self.put(model, temperature, messages, response, **params)
+            return response
+
+    def _evict(self):
+        # Caller holds self._lock (or is still connecting)
+        self._puts_since_evict = 0
+        conn = self._conn
+        conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            # Trim to 90% of the cap so eviction does not run on every insert
+            excess = total - int(self.max_bytes * 0.9)
+            freed = 0
+            stale = []
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used"):
+                if freed >= excess:
+                    break
+                stale.append((key,))
+                freed += size
+            conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+        conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
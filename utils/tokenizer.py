@@ -0,0 +1,12 @@
+# utils/tokenizer.py
+
+from functools import lru_cache
+import tiktoken
+
+
+@lru_cache(maxsize=None)
+def get_encoder(model_name: str = "gpt-4"):
+    """
+    Returns the process-wide tiktoken encoder for `model_name`, loaded once.
+    """
+    return tiktoken.encoding_for_model(model_name)
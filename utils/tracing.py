@@ -0,0 +1,148 @@
+# utils/tracing.py
+
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+_current_span: "contextvars.ContextVar[Optional[dict]]" = contextvars.ContextVar("trace_span", default=None)
+
+_shared_tracer: Optional["Tracer"] = None
+_shared_lock = threading.Lock()
+
+
+def get_tracer() -> "Tracer":
+    """
+    Returns the process-wide tracer.
+    """
+    global _shared_tracer
+    with _shared_lock:
+        if _shared_tracer is None:
+            _shared_tracer = Tracer()
+        return _shared_tracer
+
+
+def span(name: str, **attrs):
+    """
+    Times a block as a span of the process-wide tracer:
+
+        with span("compile", files=3) as attrs:
+            ...
+            attrs["backend"] = "server"
+    """
+    return get_tracer().span(name, **attrs)
+
+
+class Tracer:
+    """
+    Records nested timing spans with attributes and exports them in the Chrome trace
+    event format (chrome://tracing, Perfetto, speedscope).
+
+    Spans nest per thread (and per asyncio task) through a context variable. Besides the
+    raw events (capped at TRACE_MAX_EVENTS), per-name and per-file totals are kept for
+    the run summary. A file's time counts only its outermost span, so nested spans for
+    the same file are not added twice.
+    """
+
+    def __init__(self, max_events: Optional[int] = None):
+        self.max_events = max_events or int(os.getenv("TRACE_MAX_EVENTS", "200000"))
+        self.pid = os.getpid()
+        self.dropped = 0
+
+        self._origin = time.perf_counter()
+        self._events: List[dict] = []
+        self._threads: Dict[int, str] = {}
+        self._stages: Dict[str, dict] = {}
+        self._files: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        parent = _current_span.get()
+        current = {"name": name, "attrs": attrs}
+        token = _current_span.set(current)
+        start = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            _current_span.reset(token)
+            file_root = "file" in attrs and (parent is None or parent["attrs"].get("file") != attrs["file"])
+            self._record(name, start, duration, attrs, parent["name"] if parent else None, file_root)
+
+    def _record(self, name: str, start: float, duration: float, attrs: dict, parent: Optional[str], file_root: bool):
+        thread = threading.current_thread()
+        with self._lock:
+            stage = self._stages.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            stage["count"] += 1
+            stage["total"] += duration
+            stage["max"] = max(stage["max"], duration)
+            if file_root:
+                self._files[attrs["file"]] = self._files.get(attrs["file"], 0.0) + duration
+
+            if len(self._events) >= self.max_events:
+                self.dropped += 1
+                return
+            self._threads.setdefault(thread.ident, thread.name)
+            args = dict(attrs)
+            if parent:
+                args["parent"] = parent
+            self._events.append({
+                "name": name,
+                "cat": name.split(".", 1)[0],
+                "ph": "X",
+                "ts": round((start - self._origin) * 1e6, 1),
+                "dur": round(duration * 1e6, 1),
+                "pid": self.pid,
+                "tid": thread.ident,
+                "args": args
+            })
+
+    def export(self, path: str):
+        """
+        Writes the recorded spans as a Chrome trace JSON file.
+        """
+        with self._lock:
+            events = [
+                {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                for tid, name in self._threads.items()
+            ] + list(self._events)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+        print(f"🧾 Trace written to {path} ({len(events)} events{f', {self.dropped} dropped' if self.dropped else ''})")
+
+    def summary(self, top: int = 10) -> dict:
+        """
+        {"stages": [{name, count, total, mean, max}], "files": [{file, total}]}, slowest first.
+        """
+        with self._lock:
+            stages = sorted(self._stages.items(), key=lambda item: -item[1]["total"])[:top]
+            files = sorted(self._files.items(), key=lambda item: -item[1])[:top]
+        return {
+            "stages": [
+                {"name": name, "count": s["count"], "total": s["total"], "mean": s["total"] / s["count"], "max": s["max"]}
+                for name, s in stages
+            ],
+            "files": [{"file": file, "total": total} for file, total in files]
+        }
+
+    def print_summary(self, top: int = 10):
+        summary = self.summary(top)
+        if not summary["stages"]:
+            return
+        print("⏱️ Slowest stages (total / calls / mean / max):")
+        for s in summary["stages"]:
+            print(f"   {s['name']:<24} {s['total']:9.2f}s  {s['count']:6d}  {s['mean']:8.3f}s  {s['max']:8.3f}s")
+        if summary["files"]:
+            print("🐢 Slowest files:")
+            for f in summary["files"]:
+                print(f"   {f['total']:9.2f}s  {f['file']}")